@@ -6,320 +6,124 @@ Created on Fri Jun  7 16:36:56 2019
 @author: ftxsilva
 """
 
-import os
-import math
-import csv
-import torch
-import numpy as np
+import argparse
+import manifest
+from cleaning import (records_dir, window, header, features, cleaned_features, changes, all_sessions, save_cache,
+                      source_hash, session_windows, handover_windows, feature_set, store_folder, resolutions,
+                      event_features, WindowWriter)
+import window_store
+from window_store import WindowStore
+from table import table_dir, TableWriter
+from metadata import MetadataWriter
+
+parser = argparse.ArgumentParser(description = 'Clean the recorded sessions and break them down in sequences (10 seconds by default), without normalizing them.')
+parser.add_argument('--jobs', type = int, default = 1,
+                    help = 'number of processes cleaning sessions in parallel (0 : all cores)')
+parser.add_argument('--incremental', action = 'store_true',
+                    help = 'only clean the recordings that are new or changed since the last run')
+parser.add_argument('--csv', action = 'store_true',
+                    help = 'also write every window as its own csv file')
+parser.add_argument('--window', default = str(window),
+                    help = 'number of rows (seconds) in a window, or a comma separated list (10,30,60) of window lengths, each packed in its own store')
+parser.add_argument('--stride', default = None,
+                    help = 'rows between the starts of two windows, one for every window length or one per length (default : the window, no overlap)')
+parser.add_argument('--features', default = 'all',
+                    help = 'feature set (all, trajectory, situation) or comma separated features kept in the windows (speed, angular_velocity, sin_theta and cos_theta included)')
+parser.add_argument('--handover', action = 'store_true',
+                    help = 'also pack the windows centred on every robot_mode change in a <store>_handover store')
 
 # =============================================================================
-# Cleaning functions
+# Cleaning, splitting on robot mode and breaking down in 10 second sequences
 # =============================================================================
 
-def direction(old,new) :
-    old = old.astype(float)
-    new = new.astype(float)
-    return new[2] - old[2]
-
-def avancement(old,new) :
-    old = old.astype(float)
-    new = new.astype(float)
-    return math.sqrt(pow(old[0]-new[0],2)+pow(old[1]-new[1],2))
-
-def keys(string) :
-    activations = np.zeros(5)
-    if string == '-1' :
-        return activations
-    while (string != '') :
-        if 'left' in string[:4] : 
-            string = string[4:]
-            activations[0] += 1
-        elif 'right' in string[:5] :
-            string = string[5:]
-            activations[1] += 1
-        elif 'front' in string[:5] :
-            string = string[5:]
-            activations[2] += 1
-        elif 'back' in string[:4] :
-            string = string[4:]
-            activations[3] += 1
-        elif 'spac' in string[:4] :
-            string = string[4:]
-            activations[4] += 1
-        else :
-            string = string[1:]
-    return activations
-
-def clicks(string) :
-    activations = np.zeros(14)
-    if string == '-1' :
-        return activations
-    while (string != '') :
-        if 'left' in string[:4] : 
-            string = string[4:]
-            activations[0] += 1
-        elif 'right' in string[:5] :
-            string = string[5:]
-            activations[1] += 1
-        elif 'push' in string[:4] :
-            string = string[4:]
-            activations[2] += 1
-        elif 'wrench' in string[:6] :
-            string = string[6:]
-            activations[3] += 1
-        elif 'leak_1' in string[:6] :
-            string = string[6:]
-            activations[4] += 1
-        elif 'leak_2' in string[:6] :
-            string = string[6:]
-            activations[5] += 1
-        elif 'leak_3' in string[:6] :
-            string = string[6:]
-            activations[6] += 1
-        elif 'leak_4' in string[:6] :
-            string = string[6:]
-            activations[7] += 1
-        elif 'leak_5' in string[:6] :
-            string = string[6:]
-            activations[8] += 1
-        elif 'leak_6' in string[:6] :
-            string = string[6:]
-            activations[9] += 1
-        elif 'leak_7' in string[:6] :
-            string = string[6:]
-            activations[10] += 1
-        elif 'leak_8' in string[:6] :
-            string = string[6:]
-            activations[11] += 1
-        elif 'leak_9' in string[:6] :
-            string = string[6:]
-            activations[12] += 1
-        elif 'rm_alarm' in string[:8] :
-            string = string[8:]
-            activations[13] += 1
-        else :
-            string = string[1:]
-    return activations
-
-def binaryToData(state,n):
-    state = str(state)
-    if 9 - n >= len(state) :
-        return 0
-    else :
-        return int(state[n-10+len(state)])
-
-count = 0
-
-# =============================================================================
-# Regrouping data into one file
-# =============================================================================
-
-with open('../Data/all_recorded_data.csv', 'w', newline = '') as alldata :
-    writer = csv.writer(alldata,delimiter=',')
-    for i in range(9978): #9978
-        try :
-            with open('../Data/recorded_csv_data2/FRGrecord_' + str(i) + '.csv', 'r') as file:
-                 data = csv.reader(file, delimiter=',')
-                 line_count = 0
-                 for row in data :
-                     if line_count == 0 :
-                         if i == 7 :
-                             writer.writerow(row[:6] + 
-                                             ['tree 1', 'tree 2','tree 3', 'tree 4','tree 5', 'tree 6','tree 7', 'tree 8', 'tree 9'] + 
-                                             row[7:11] +
-                                             ['leak 1', 'leak 2','leak 3', 'leak 4','leak 5', 'leak 6','leak 7', 'leak 8', 'leak 9'] +
-                                             ['direction','avancement'] + 
-                                             ['left', 'right', 'front', 'back', 'space'] +
-                                             ['left', 'right', 'push', 'wrench', 'leak 1', 'leak 2','leak 3', 'leak 4','leak 5', 'leak 6','leak 7', 'leak 8', 'leak 9', 'rm_alarm'] + 
-                                             row[14:])
-                     elif line_count == 1 :
-                         writer.writerow(np.concatenate(([
-                                row[0],
-                                row[1],
-                                row[2],
-                                row[3],
-                                row[4],
-                                row[5],
-                                binaryToData(row[6],1),
-                                binaryToData(row[6],2),
-                                binaryToData(row[6],3),
-                                binaryToData(row[6],4),
-                                binaryToData(row[6],5),
-                                binaryToData(row[6],6),
-                                binaryToData(row[6],7),
-                                binaryToData(row[6],8),
-                                binaryToData(row[6],9),
-                                row[7],
-                                row[8],
-                                row[9],
-                                row[10],
-                                binaryToData(row[11],1),
-                                binaryToData(row[11],2),
-                                binaryToData(row[11],3),
-                                binaryToData(row[11],4),
-                                binaryToData(row[11],5),
-                                binaryToData(row[11],6),
-                                binaryToData(row[11],7),
-                                binaryToData(row[11],8),
-                                binaryToData(row[11],9),
-                                0,
-                                0],
-                                keys(row[12]),
-                                clicks(row[13]),
-                                [row[14],
-                                row[15]
-                                ])))
-                     else :
-                         writer.writerow(np.concatenate(([
-                                row[0],
-                                row[1],
-                                row[2],
-                                row[3],
-                                row[4],
-                                row[5],
-                                binaryToData(row[6],1),
-                                binaryToData(row[6],2),
-                                binaryToData(row[6],3),
-                                binaryToData(row[6],4),
-                                binaryToData(row[6],5),
-                                binaryToData(row[6],6),
-                                binaryToData(row[6],7),
-                                binaryToData(row[6],8),
-                                binaryToData(row[6],9),
-                                row[7],
-                                row[8],
-                                row[9],
-                                row[10],
-                                binaryToData(row[11],1),
-                                binaryToData(row[11],2),
-                                binaryToData(row[11],3),
-                                binaryToData(row[11],4),
-                                binaryToData(row[11],5),
-                                binaryToData(row[11],6),
-                                binaryToData(row[11],7),
-                                binaryToData(row[11],8),
-                                binaryToData(row[11],9),
-                                direction(old_state,np.array(row[3:6])),
-                                avancement(old_state,np.array(row[3:6]))],
-                                keys(row[12]),
-                                clicks(row[13]),
-                                [row[14],
-                                row[15]
-                                ])))
-                     old_state = np.array(row[3:6])
-                     line_count += 1
-        except FileNotFoundError :
-            count += 1
-
-print('Data collected into one file')
-
-# =============================================================================
-# Splitting data based en robot mode
-# =============================================================================
-
-#import current data
-#all assembled in one sole file
-
-with open('../Data/all_recorded_data.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-    header = np.array(data[0])
-    data = np.array(data)
-
-#create new files
-with open('../Data/Autonomous_non_normalized.csv','w',newline='') as newfile1 :
-        writer1 = csv.writer(newfile1,delimiter=',')
-        writer1.writerow(header)
-
-        with open('../Data/Human_non_normalized.csv','w', newline='') as newfile2 :
-                writer2 = csv.writer(newfile2,delimiter=',')
-                writer2.writerow(header)
-        
-                #split data
-                n = 1
-                while n < len(data):
-                    if float(data[n][1]) == 0 :
-                        writer2.writerow(data[n])
-                    elif float(data[n][1]) == 1:
-                        writer1.writerow(data[n])
-                    n += 1
-
-print('Files splitted based on robot mode')
-
-# =============================================================================
-# Breaking down Autonomous data in 10 second sequences
-# =============================================================================
-
-with open('../Data/Autonomous_non_normalized.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-    header = np.array(data[0])
-    n_rows = sum(1 for line in data)
-
-print('Autonomous data loaded')
-n = 1
-
-# list to store the files to be deleted
-tobedel = []
-
-for i in range(int(n_rows/10)) :
-    with open('../Data/original data/Autonomous data/'+str(i)+'.csv','w',newline='') as newfile :
-        writer = csv.writer(newfile,delimiter=',')
-        writer.writerow(header)
-        count = 0
-        while count<10:
-            writer.writerow(data[n])
-            if(float(data[n][0])-float(data[n+1][0]) < 0 and count!=9):
-                count = 10
-                tobedel.insert(0,i)
-            else:
-                count+=1          
-            n+=1
-
-#remove files
-for j in tobedel:
-    os.remove('../Data/original data/Autonomous data/'+str(j)+'.csv')
-print('All normalized breakdowned autonomous files treated')
-
-with open('../Data/Human_non_normalized.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-    header = np.array(data[0])
-    n_rows = sum(1 for line in data)
-
-print('Human data loaded')
-n = 1
-
-# =============================================================================
-# Breaking down Human data in 10 second sequences
-# =============================================================================
-
-# list to store the files to be deleted
-tobedel = []
-
-for i in range(int(n_rows/10)) :
-    with open('../Data/original data/Human data/'+str(i)+'.csv','w',newline='') as newfile :
-        writer = csv.writer(newfile,delimiter=',')
-        writer.writerow(header)
-        count = 0
-        while count<10:
-            writer.writerow(data[n])
-            if(float(data[n][0])-float(data[n+1][0]) < 0 and count!=9):
-                count = 10
-                tobedel.insert(0,i)
-            else:
-                count+=1          
-            n+=1
-
-#remove files
-for j in tobedel:
-    os.remove('../Data/original data/Human data/'+str(j)+'.csv')
-
-print('All normalized breakdowned human files treated')
-
-# =============================================================================
-# Removing temporary files
-# =============================================================================
-
-os.remove('../Data/Autonomous_non_normalized.csv')
-os.remove('../Data/Human_non_normalized.csv')
\ No newline at end of file
+if __name__ == '__main__' :
+    args = parser.parse_args()
+    name, columns = feature_set(args.features)
+    selected = [cleaned_features.index(column) for column in columns]
+    # the key and click counts of the set (always its last columns) are
+    # stored as event lists, the other columns as dense windows
+    sparse = [column for column in columns if column in event_features]
+    dense = len(columns) - len(sparse)
+    window_lengths = resolutions(args.window, args.stride)
+    folders = {size : store_folder('../Data/windows_non_normalized', name, size) for size, stride in window_lengths}
+
+    entries = manifest.update(records_dir)
+    entries_cleaned, removed = changes(entries, args.incremental)
+
+    # each feature set and window length has its own store, stamped with the
+    # recordings it was cut from
+    source = source_hash(entries)
+    if (args.incremental and not entries_cleaned and not removed and
+        all(window_store.current(folders[size], columns, size, stride, source) and
+            (not args.handover or window_store.current(folders[size] + '_handover', columns, size, None, source))
+            for size, stride in window_lengths)) :
+        print('Nothing changed since the last run')
+        raise SystemExit
+
+    # Every session goes straight from its FRGrecord file (or the cache when
+    # it did not change) to the packed window store of the selected features
+    # and of each window length, with the metadata of its sessions and
+    # windows to select windows on
+    stores, metadata, writers = {}, {}, {}
+    for size, stride in window_lengths :
+        stores[size] = WindowStore(folders[size], columns, size, stride, source, events = sparse)
+        metadata[size] = MetadataWriter(folders[size])
+    # With --handover the windows centred on every robot_mode change go to
+    # their own store, in the partition of the mode after the change, with
+    # the direction and offset of the change
+    handovers, handover_metadata = {}, {}
+    if args.handover :
+        for size, stride in window_lengths :
+            handovers[size] = WindowStore(folders[size] + '_handover', columns, size, None, source, ['direction', 'offset'], sparse)
+            handover_metadata[size] = MetadataWriter(folders[size] + '_handover')
+    # and its typed columns to the cleaned table
+    table = TableWriter(table_dir, features)
+
+    # With --csv the windows of the new or changed sessions are also written
+    # as csv files, the windows of changed or deleted recordings are replaced
+    if args.csv :
+        # every column (raw errors and shortcuts included) unless a feature
+        # set is selected
+        csv_columns = header if name == 'all' else columns
+        replaced = set(removed) | set(entry['session'] for entry in entries_cleaned)
+        for size, stride in window_lengths :
+            writers[size] = {1 : WindowWriter(store_folder('../Data/original data/Autonomous data', name, size), csv_columns, args.incremental),
+                             0 : WindowWriter(store_folder('../Data/original data/Human data', name, size), csv_columns, args.incremental)}
+            for writer in writers[size].values() :
+                writer.remove(replaced)
+
+    # every window length is cut from the same read of each session
+    for session, data, raw, cleaned in all_sessions(entries, entries_cleaned, args.jobs) :
+        table.write(data[:,:len(features)], session)
+        projected = data[:,selected]
+        for size, stride in window_lengths :
+            modes, rows = session_windows(data, size, stride)
+            stores[size].write(projected[rows][:,:,:dense], session, data[rows[:,0],0], modes, events = projected[rows][:,:,dense:])
+            metadata[size].write(session, data, modes, rows)
+            if args.handover :
+                directions, offsets, handover_rows = handover_windows(data, size)
+                handover_modes = data[handover_rows[:,0] + offsets, 1]
+                handovers[size].write(projected[handover_rows][:,:,:dense], session, data[handover_rows[:,0],0], handover_modes,
+                                     [directions, offsets], projected[handover_rows][:,:,dense:])
+                handover_metadata[size].write(session, data, handover_modes, handover_rows)
+            if cleaned and size in writers :
+                for mode, window_rows in zip(modes, rows) :
+                    if mode in writers[size] :
+                        if name == 'all' :
+                            writers[size][mode].write([list(data[n,:len(features)]) + list(raw[n]) for n in window_rows], session)
+                        else :
+                            writers[size][mode].write(projected[window_rows], session)
+
+    save_cache(entries, removed)
+    table.close()
+    print('Sessions cleaned :', len(entries_cleaned), '( removed :', len(removed), ')')
+    for size, stride in window_lengths :
+        metadata[size].close()
+        stores[size].close()
+        for writer in writers.get(size, {}).values() :
+            writer.close()
+        print('All breakdowned windows packed :', stores[size].count, '(' + name, ':', len(columns), 'features,', size, 'rows )')
+        if args.handover :
+            handover_metadata[size].close()
+            handovers[size].close()
+            print('Handover windows packed :', handovers[size].count, '(' + str(size), 'rows )')
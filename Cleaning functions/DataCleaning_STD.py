@@ -7,347 +7,156 @@ Created on Fri Jun  7 16:36:56 2019
 @author: felipetxs
 """
 
-import os
-import math
-import csv
-import torch
-import numpy as np
-
-# =============================================================================
-# Cleaning functions
-# =============================================================================
-
-def direction(old,new) :
-    old = old.astype(float)
-    new = new.astype(float)
-    return new[2] - old[2]
-
-def avancement(old,new) :
-    old = old.astype(float)
-    new = new.astype(float)
-    return math.sqrt(pow(old[0]-new[0],2)+pow(old[1]-new[1],2))
-
-def keys(string) :
-    activations = np.zeros(5)
-    if string == '-1' :
-        return activations
-    while (string != '') :
-        if 'left' in string[:4] : 
-            string = string[4:]
-            activations[0] += 1
-        elif 'right' in string[:5] :
-            string = string[5:]
-            activations[1] += 1
-        elif 'front' in string[:5] :
-            string = string[5:]
-            activations[2] += 1
-        elif 'back' in string[:4] :
-            string = string[4:]
-            activations[3] += 1
-        elif 'spac' in string[:4] :
-            string = string[4:]
-            activations[4] += 1
-        else :
-            string = string[1:]
-    return activations
-
-def clicks(string) :
-    activations = np.zeros(14)
-    if string == '-1' :
-        return activations
-    while (string != '') :
-        if 'left' in string[:4] : 
-            string = string[4:]
-            activations[0] += 1
-        elif 'right' in string[:5] :
-            string = string[5:]
-            activations[1] += 1
-        elif 'push' in string[:4] :
-            string = string[4:]
-            activations[2] += 1
-        elif 'wrench' in string[:6] :
-            string = string[6:]
-            activations[3] += 1
-        elif 'leak_1' in string[:6] :
-            string = string[6:]
-            activations[4] += 1
-        elif 'leak_2' in string[:6] :
-            string = string[6:]
-            activations[5] += 1
-        elif 'leak_3' in string[:6] :
-            string = string[6:]
-            activations[6] += 1
-        elif 'leak_4' in string[:6] :
-            string = string[6:]
-            activations[7] += 1
-        elif 'leak_5' in string[:6] :
-            string = string[6:]
-            activations[8] += 1
-        elif 'leak_6' in string[:6] :
-            string = string[6:]
-            activations[9] += 1
-        elif 'leak_7' in string[:6] :
-            string = string[6:]
-            activations[10] += 1
-        elif 'leak_8' in string[:6] :
-            string = string[6:]
-            activations[11] += 1
-        elif 'leak_9' in string[:6] :
-            string = string[6:]
-            activations[12] += 1
-        elif 'rm_alarm' in string[:8] :
-            string = string[8:]
-            activations[13] += 1
-        else :
-            string = string[1:]
-    return activations
-
-def binaryToData(state,n):
-    state = str(state)
-    if 9 - n >= len(state) :
-        return 0
-    else :
-        return int(state[n-10+len(state)])
-
-count = 0
-
-# =============================================================================
-# Regrouping data into one file
-# =============================================================================
-
-with open('../Data/all_recorded_data.csv', 'w', newline = '') as alldata :
-    writer = csv.writer(alldata,delimiter=',')
-    for i in range(9978): #9978
-        try :
-            with open('../Data/recorded_csv_data2/FRGrecord_' + str(i) + '.csv', 'r') as file:
-                 data = csv.reader(file, delimiter=',')
-                 line_count = 0
-                 for row in data :
-                     if line_count == 0 :
-                         if i == 7 :
-                             writer.writerow(row[:6] + 
-                                             ['tree 1', 'tree 2','tree 3', 'tree 4','tree 5', 'tree 6','tree 7', 'tree 8', 'tree 9'] + 
-                                             row[7:11] +
-                                             ['leak 1', 'leak 2','leak 3', 'leak 4','leak 5', 'leak 6','leak 7', 'leak 8', 'leak 9'] +
-                                             ['direction','avancement'] + 
-                                             ['left', 'right', 'front', 'back', 'space'] +
-                                             ['left', 'right', 'push', 'wrench', 'leak 1', 'leak 2','leak 3', 'leak 4','leak 5', 'leak 6','leak 7', 'leak 8', 'leak 9', 'rm_alarm'] + 
-                                             row[14:])
-                     elif line_count == 1 :
-                         writer.writerow(np.concatenate(([
-                                row[0],
-                                row[1],
-                                row[2],
-                                row[3],
-                                row[4],
-                                row[5],
-                                binaryToData(row[6],1),
-                                binaryToData(row[6],2),
-                                binaryToData(row[6],3),
-                                binaryToData(row[6],4),
-                                binaryToData(row[6],5),
-                                binaryToData(row[6],6),
-                                binaryToData(row[6],7),
-                                binaryToData(row[6],8),
-                                binaryToData(row[6],9),
-                                row[7],
-                                row[8],
-                                row[9],
-                                row[10],
-                                binaryToData(row[11],1),
-                                binaryToData(row[11],2),
-                                binaryToData(row[11],3),
-                                binaryToData(row[11],4),
-                                binaryToData(row[11],5),
-                                binaryToData(row[11],6),
-                                binaryToData(row[11],7),
-                                binaryToData(row[11],8),
-                                binaryToData(row[11],9),
-                                0,
-                                0],
-                                keys(row[12]),
-                                clicks(row[13]),
-                                [row[14],
-                                row[15]
-                                ])))
-                     else :
-                         writer.writerow(np.concatenate(([
-                                row[0],
-                                row[1],
-                                row[2],
-                                row[3],
-                                row[4],
-                                row[5],
-                                binaryToData(row[6],1),
-                                binaryToData(row[6],2),
-                                binaryToData(row[6],3),
-                                binaryToData(row[6],4),
-                                binaryToData(row[6],5),
-                                binaryToData(row[6],6),
-                                binaryToData(row[6],7),
-                                binaryToData(row[6],8),
-                                binaryToData(row[6],9),
-                                row[7],
-                                row[8],
-                                row[9],
-                                row[10],
-                                binaryToData(row[11],1),
-                                binaryToData(row[11],2),
-                                binaryToData(row[11],3),
-                                binaryToData(row[11],4),
-                                binaryToData(row[11],5),
-                                binaryToData(row[11],6),
-                                binaryToData(row[11],7),
-                                binaryToData(row[11],8),
-                                binaryToData(row[11],9),
-                                direction(old_state,np.array(row[3:6])),
-                                avancement(old_state,np.array(row[3:6]))],
-                                keys(row[12]),
-                                clicks(row[13]),
-                                [row[14],
-                                row[15]
-                                ])))
-                     old_state = np.array(row[3:6])
-                     line_count += 1
-        except FileNotFoundError :
-            count += 1
-
-print('Data collected into one file')
-
-# =============================================================================
-# Data standardization
-# =============================================================================
-
-with open('../Data/all_recorded_data.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-
-header = np.array(data[0][:49])
-data = np.array(data)
-data = data[1:,:49]
-data = data.astype(float)
-mean = np.mean(data,axis=0)
-std = np.std(data,axis=0)
-data -= mean
-data /= std
-    
-with open('../Data/all_recorded_data_normalized.csv','w',newline='') as newfile :
-    writer = csv.writer(newfile,delimiter=',')
-    writer.writerow(header)
-    for row in data :
-        writer.writerow(row)
-
-print('Data normalized')
-
-# =============================================================================
-# Splitting data based en robot mode
-# =============================================================================
-
-#import current data
-#all assembled in one sole file
-
-with open('../Data/all_recorded_data_normalized.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-    header = np.array(data[0])
-    data = np.array(data)
-
-#create new files
-with open('../Data/Autonomous.csv','w',newline='') as newfile1 :
-        writer1 = csv.writer(newfile1,delimiter=',')
-        writer1.writerow(header)
-
-        with open('../Data/Human.csv','w', newline='') as newfile2 :
-                writer2 = csv.writer(newfile2,delimiter=',')
-                writer2.writerow(header)
-        
-                #split data
-                n = 1
-                while n < len(data):
-                    if float(data[n][1]) < 0 :
-                        writer2.writerow(data[n])
-                    elif float(data[n][1]) > 1:
-                        writer1.writerow(data[n])
-                    n += 1
-
-print('Files splitted based on robot mode')
-
-# =============================================================================
-# Breaking down Autonomous data in 10 second sequences
-# =============================================================================
-
-with open('../Data/Autonomous.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-    header = np.array(data[0])
-    n_rows = sum(1 for line in data)
-
-print('Autonomous data loaded')
-n = 1
-
-# list to store the files to be deleted
-tobedel = []
-
-for i in range(int(n_rows/10)) :
-    with open('../Data/All data/autonomous_cleaned_normalized/'+str(i)+'.csv','w',newline='') as newfile :
-        writer = csv.writer(newfile,delimiter=',')
-        writer.writerow(header)
-        count = 0
-        while count<10:
-            writer.writerow(data[n])
-            if(float(data[n][0])-float(data[n+1][0]) < 0 and count!=9):
-                count = 10
-                tobedel.insert(0,i)
-            else:
-                count+=1          
-            n+=1
-
-#remove files
-for j in tobedel:
-    os.remove('../Data/All data/autonomous_cleaned_normalized/'+str(j)+'.csv')
-print('All normalized breakdowned autonomous files treated')
-
-with open('../Data/Human.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-    header = np.array(data[0])
-    n_rows = sum(1 for line in data)
-
-print('Human data loaded')
-n = 1
-
-# =============================================================================
-# Breaking down Human data in 10 second sequences
-# =============================================================================
-
-# list to store the files to be deleted
-tobedel = []
-
-for i in range(int(n_rows/10)) :
-    with open('../Data/All data/human_cleaned_normalized/'+str(i)+'.csv','w',newline='') as newfile :
-        writer = csv.writer(newfile,delimiter=',')
-        writer.writerow(header)
-        count = 0
-        while count<10:
-            writer.writerow(data[n])
-            if(float(data[n][0])-float(data[n+1][0]) < 0 and count!=9):
-                count = 10
-                tobedel.insert(0,i)
-            else:
-                count+=1          
-            n+=1
-
-#remove files
-for j in tobedel:
-    os.remove('../Data/All data/human_cleaned_normalized/'+str(j)+'.csv')
-
-print('All normalized breakdowned human files treated')
-
-# =============================================================================
-# Removing temporary files
-# =============================================================================
-
-os.remove('../Data/all_recorded_data.csv')
-os.remove('../Data/all_recorded_data_normalized.csv')
-os.remove('../Data/Autonomous.csv')
-os.remove('../Data/Human.csv')
+import argparse
+import manifest
+import stats
+import normalization
+from cleaning import (records_dir, window, features, cleaned_features, changes, cache_sessions, save_cache,
+                      source_hash, load_session, session_stats, session_windows, handover_windows, feature_set,
+                      store_folder, resolutions, event_features, WindowWriter)
+import window_store
+from window_store import WindowStore
+from table import table_dir, TableWriter
+from metadata import MetadataWriter
+
+parser = argparse.ArgumentParser(description = 'Clean, normalize and break down the recorded sessions in sequences (10 seconds by default).')
+parser.add_argument('--jobs', type = int, default = 1,
+                    help = 'number of processes cleaning sessions in parallel (0 : all cores)')
+parser.add_argument('--incremental', action = 'store_true',
+                    help = 'only clean the recordings that are new or changed since the last run')
+parser.add_argument('--csv', action = 'store_true',
+                    help = 'also write every window as its own csv file')
+parser.add_argument('--window', default = str(window),
+                    help = 'number of rows (seconds) in a window, or a comma separated list (10,30,60) of window lengths, each packed in its own store')
+parser.add_argument('--stride', default = None,
+                    help = 'rows between the starts of two windows, one for every window length or one per length (default : the window, no overlap)')
+parser.add_argument('--features', default = 'all',
+                    help = 'feature set (all, trajectory, situation) or comma separated features kept in the windows (speed, angular_velocity, sin_theta and cos_theta included)')
+parser.add_argument('--handover', action = 'store_true',
+                    help = 'also pack the windows centred on every robot_mode change in a <store>_handover store')
+parser.add_argument('--float16', action = 'store_true',
+                    help = 'store the normalized windows as float16 (half the size), read back as float32 for training')
+parser.add_argument('--chunk', type = int, default = 65536,
+                    help = 'rows normalized and written at a time (the memory used does not depend on the number of sessions)')
+
+if __name__ == '__main__' :
+    args = parser.parse_args()
+    name, columns = feature_set(args.features)
+    selected = [cleaned_features.index(column) for column in columns]
+    # the key and click counts of the set (always its last columns) are
+    # stored as event lists, the other columns as dense windows
+    sparse = [column for column in columns if column in event_features]
+    dense = len(columns) - len(sparse)
+    window_lengths = resolutions(args.window, args.stride)
+    dtype = 'float16' if args.float16 else 'float32'
+    folders = {size : store_folder('../Data/windows_normalized', name, size) for size, stride in window_lengths}
+
+    # =============================================================================
+    # Cleaning the recordings
+    # =============================================================================
+
+    # Cleaned sessions are kept in ../Data/cleaned_sessions with the column
+    # statistics of their features, only new or changed recordings are
+    # cleaned again in incremental mode. The workers only hand back session
+    # ids, every session is read back from the cache when it is normalized.
+    entries = manifest.update(records_dir)
+    entries_cleaned, removed = changes(entries, args.incremental)
+    cache_sessions(args.jobs, entries_cleaned)
+    save_cache(entries, removed)
+
+    # each feature set has its own store, stamped with the recordings it
+    # was cut from
+    source = source_hash(entries)
+    print('Sessions cleaned :', len(entries_cleaned), '( removed :', len(removed), ')')
+    if args.incremental and all(window_store.current(folders[size], columns, size, stride, source, dtype) and
+                                (not args.handover or window_store.current(folders[size] + '_handover', columns, size, None, source, dtype))
+                                for size, stride in window_lengths) :
+        print('Nothing changed since the last run')
+        raise SystemExit
+
+    # =============================================================================
+    # Data standardization
+    # =============================================================================
+
+    # Every worker saved the statistics of the sessions it cleaned with their
+    # rows, they are merged in session order without reading any row again.
+    # Normalizing is then a second pass over the cached sessions, one at a
+    # time, so the data never has to fit in memory.
+    accumulator = stats.Accumulator(len(cleaned_features))
+    for entry in entries :
+        accumulator.merge(session_stats(entry['session']))
+    mean, std = accumulator.mean_std()
+
+    # saved for the denormalization of the generated samples
+    normalization.save(cleaned_features, mean, std, accumulator.summary[0], source)
+
+    print('Statistics of', accumulator.summary[0], 'rows merged')
+
+    # =============================================================================
+    # Normalizing, splitting on robot mode and breaking down in 10 second sequences
+    # =============================================================================
+
+    # Windows of the selected features are packed in ../Data/windows_normalized
+    # (_<feature set>)(_<window length>s), one store per window length, with
+    # the metadata of their sessions and windows to select windows on. With
+    # --csv they are also written as csv files.
+    stores, metadata, writers = {}, {}, {}
+    scale = (mean[selected[dense:]], std[selected[dense:]])
+    for size, stride in window_lengths :
+        stores[size] = WindowStore(folders[size], columns, size, stride, source, events = sparse, scale = scale, dtype = dtype)
+        metadata[size] = MetadataWriter(folders[size], args.chunk)
+        if args.csv :
+            writers[size] = {1 : WindowWriter(store_folder('../Data/All data/autonomous_cleaned_normalized', name, size), columns),
+                             0 : WindowWriter(store_folder('../Data/All data/human_cleaned_normalized', name, size), columns)}
+    # With --handover the windows centred on every robot_mode change go to
+    # their own store, in the partition of the mode after the change, with
+    # the direction and offset of the change
+    handovers, handover_metadata = {}, {}
+    if args.handover :
+        for size, stride in window_lengths :
+            handovers[size] = WindowStore(folders[size] + '_handover', columns, size, None, source, ['direction', 'offset'],
+                                         sparse, scale, dtype)
+            handover_metadata[size] = MetadataWriter(folders[size] + '_handover', args.chunk)
+    # the cleaned (not normalized) sessions go to the columnar table
+    table = TableWriter(table_dir, features)
+
+    # every window length is cut from the same read of each session, its
+    # windows are normalized and written at most --chunk rows at a time
+    for entry in entries :
+        session = entry['session']
+        data, raw = load_session(session)
+        table.write(data[:,:len(features)], session)
+        for size, stride in window_lengths :
+            step = max(1, args.chunk//size)
+            modes, rows = session_windows(data, size, stride)
+            metadata[size].write(session, data, modes, rows)
+            for first in range(0, len(rows), step) :
+                batch, batch_modes = rows[first:first + step], modes[first:first + step]
+                windows = (data[batch[:,:,None], selected] - mean[selected])/std[selected]
+                stores[size].write(windows[:,:,:dense], session, data[batch[:,0],0], batch_modes,
+                                   events = data[batch[:,:,None], selected[dense:]])
+                for mode, window_data in zip(batch_modes, windows) :
+                    if mode in writers.get(size, {}) :
+                        writers[size][mode].write(window_data, session)
+            if args.handover :
+                directions, offsets, rows = handover_windows(data, size)
+                modes = data[rows[:,0] + offsets, 1]
+                handover_metadata[size].write(session, data, modes, rows)
+                for first in range(0, len(rows), step) :
+                    batch = rows[first:first + step]
+                    windows = (data[batch[:,:,None], selected[:dense]] - mean[selected[:dense]])/std[selected[:dense]]
+                    handovers[size].write(windows, session, data[batch[:,0],0], modes[first:first + step],
+                                          [directions[first:first + step], offsets[first:first + step]],
+                                          data[batch[:,:,None], selected[dense:]])
+
+    table.close()
+    for size, stride in window_lengths :
+        metadata[size].close()
+        stores[size].close()
+        for writer in writers.get(size, {}).values() :
+            writer.close()
+        print('All normalized breakdowned windows packed :', stores[size].count, '(' + name, ':', len(columns), 'features,', size, 'rows )')
+        if args.handover :
+            handover_metadata[size].close()
+            handovers[size].close()
+            print('Handover windows packed :', handovers[size].count, '(' + str(size), 'rows )')
@@ -10,25 +10,18 @@ import math
 import csv
 import torch
 import numpy as np
+import sys
+# Cleaning functions, wherever the script is run from
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import normalization
 
-### Take the mean and standard deviation from original data
-with open('../Data/all_recorded_data.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-
-header = np.array(data[0][:49])
-data = np.array(data)
-
-data = data[1:,:49]
-data = data.astype(float)
-
-mean = np.mean(data,axis=0)
-std = np.std(data,axis=0)
+### Take the mean and standard deviation the data was
+### standardized with (saved by DataCleaning_STD)
+normalizer = normalization.load()
 
 ## We only need
 ## robot_x robot_y theta
-mean = mean[3:6]
-std = std[3:6]
+names = ['robot_x', 'robot_y', 'robot_theta']
 
 ### Create new files
 ### following the original distribution
@@ -37,7 +30,7 @@ for i in range(8):
             reader = csv.reader(file, delimiter=',')
             data = np.array(list(reader))
             data = data.astype(float)
-            data = data*std + mean
+            data = normalizer.denormalize(data, names)
             #print(data)
         with open('../DCGAN/Generated Samples/'+ str(i) + '.csv','w',newline='') as newfile :
             writer = csv.writer(newfile,delimiter=',')    
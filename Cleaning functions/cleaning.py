@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming cleaning engine shared by Clean_Split and DataCleaning_STD.
+
+Every FRGrecord_<i>.csv is read once, cleaned a whole column at a time and
+cut straight into 10 second windows split on robot_mode. Only one session
+is held in memory at a time.
+
+Cleaned sessions are kept in a cache (../Data/cleaned_sessions) keyed on
+the sha1 of their recording and the version of the cleaning, so an
+incremental run only cleans the recordings that are new or changed since
+the previous run, and every recording after the cleaning changed.
+"""
+
+import os
+import re
+import math
+import csv
+import multiprocessing
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import manifest
+import records
+import stats
+
+# Folder containing the data as collected from the Firefighter simulation
+records_dir = '../Data/recorded_csv_data2'
+# Folder of the cleaned sessions, one <session>.npz per recording
+cache_dir = '../Data/cleaned_sessions'
+# Number of rows (seconds) in one window, by default windows do not overlap
+window = 10
+# Sessions cleaned by a worker between two progress messages
+progress = 100
+# Version of the cleaned sessions, saved in the cache manifest. To raise
+# whenever the output of clean_session changes (rows left out, columns),
+# cached sessions of another version are cleaned again
+version = 1
+
+# Header of the cleaned data (raw columns with the states, keys and clicks
+# spread over one column each). Every name is unique, the key and click
+# counts are prefixed to tell them from the leak states.
+header = (['remaining_time', 'robot_mode', 'alarm', 'robot_x', 'robot_y', 'robot_theta'] +
+          ['tree 1', 'tree 2','tree 3', 'tree 4','tree 5', 'tree 6','tree 7', 'tree 8', 'tree 9'] +
+          ['battery_level', 'temperature', 'water_robot_tank', 'water_ground_tank'] +
+          ['leak 1', 'leak 2','leak 3', 'leak 4','leak 5', 'leak 6','leak 7', 'leak 8', 'leak 9'] +
+          ['direction','avancement'] +
+          ['key left', 'key right', 'key front', 'key back', 'key space'] +
+          ['click left', 'click right', 'click push', 'click wrench', 'click leak 1', 'click leak 2','click leak 3',
+           'click leak 4','click leak 5', 'click leak 6','click leak 7', 'click leak 8', 'click leak 9', 'click rm_alarm'] +
+          ['errors', 'shortcuts'])
+# The 49 numeric features, errors and shortcuts are kept as raw text
+features = header[:49]
+# Key and click counts, mostly 0, kept as event lists in the window stores
+event_features = features[30:49]
+# Derived from the same pass as direction and avancement (see kinematics),
+# kept in the cleaned sessions after the 49 features and only in the windows
+# of the feature sets naming them ('robot_x,robot_y,speed,sin_theta')
+derived_features = ['speed', 'angular_velocity', 'sin_theta', 'cos_theta']
+# Columns of the cached sessions, clean_session(path, extras = True)
+cleaned_features = features + derived_features
+
+# Features consumed by each model. The windows of a feature set only hold its
+# columns and are kept in their own store (see store_folder)
+feature_sets = {'all' : features,
+                # DCGAN, CDCGAN and the validation scripts
+                'trajectory' : ['robot_x', 'robot_y', 'robot_theta'],
+                # pose, trees, levels and movement, for models conditioned on the
+                # state of the mission (no script uses it yet)
+                'situation' : features[3:19] + ['direction', 'avancement']}
+
+# Actions as written in the keys and clicks columns, in the order of the
+# cleaned columns ('spac' also matches 'space')
+key_tokens = ['left', 'right', 'front', 'back', 'spac']
+click_tokens = ['left', 'right', 'push', 'wrench', 'leak_1', 'leak_2', 'leak_3', 'leak_4',
+                'leak_5', 'leak_6', 'leak_7', 'leak_8', 'leak_9', 'rm_alarm']
+
+# =============================================================================
+# Cleaning functions
+# =============================================================================
+
+def kinematics(remaining_time, pose) :
+    # Movement of the robot between two consecutive rows of a session, from
+    # the remaining_time column and the [rows, 3] robot_x, robot_y,
+    # robot_theta columns. Returns a [rows, 6] matrix: direction (heading
+    # change wrapped to (-pi, pi]), avancement (distance travelled), speed,
+    # angular velocity, sin and cos of the heading. The first row of a
+    # session has not moved yet and gets 0 for the first four.
+    moves = np.zeros((len(pose), 6))
+    step = np.diff(pose, axis = 0)
+    turn = step[:,2] - 2*math.pi*np.ceil((step[:,2] - math.pi)/(2*math.pi))
+    distance = np.hypot(step[:,0], step[:,1])
+    # time steps are 1 second, a non decreasing remaining_time gives 0
+    dt = -np.diff(remaining_time)
+    elapsed = np.where(dt > 0, dt, np.inf)
+    moves[1:,0] = turn
+    moves[1:,1] = distance
+    moves[1:,2] = distance/elapsed
+    moves[1:,3] = turn/elapsed
+    moves[:,4] = np.sin(pose[:,2])
+    moves[:,5] = np.cos(pose[:,2])
+    return moves
+
+def count_tokens(column, tokens) :
+    # Counts every token in each string of the column, scanning left to
+    # right and skipping the characters that do not start a token: the
+    # same counts as the old per character keys() and clicks() loops.
+    # The whole column is tokenized by one regex call, the line breaks
+    # joining the rows tell which row each token belongs to.
+    pattern = re.compile('\n|' + '|'.join(re.escape(token) for token in tokens))
+    column = list(column)
+    found = pd.Categorical(pattern.findall('\n'.join(column)), categories = ['\n'] + tokens).codes
+    rows = np.cumsum(found == 0)
+    activations = np.zeros((len(column), len(tokens)))
+    np.add.at(activations, (rows[found > 0], found[found > 0] - 1), 1)
+    return activations
+
+def keys(column) :
+    return count_tokens(column, key_tokens)
+
+def clicks(column) :
+    return count_tokens(column, click_tokens)
+
+def states(column) :
+    # Decodes a forest_state or leaks_state column into a [rows, 9] matrix
+    # of 0/1 flags. The raw values are space padded (' 000000000'), they
+    # are stripped and right aligned on 9 digits, missing leading digits
+    # being 0 like in the old binaryToData().
+    column = pd.Series(list(column), dtype = str).str.strip().str[-9:].str.zfill(9)
+    digits = np.frombuffer(''.join(column).encode('ascii'), dtype = np.uint8)
+    return (digits - ord('0')).reshape(-1, 9)
+
+# =============================================================================
+# Sessions
+# =============================================================================
+
+def clean_session(path, extras = False) :
+    # Cleans one FRGrecord file. Returns the [rows, 49] float features
+    # (followed by the derived_features when extras is set, the columns of
+    # the cache) and the [rows, 2] raw errors and shortcuts columns.
+    # Malformed rows are left out and reported.
+    table, malformed = records.read_record(path)
+    for message in malformed :
+        print(os.path.basename(path), ':', message)
+    values = table[records.numbers].to_numpy()
+    moves = kinematics(values[:,0], values[:,3:6])
+    data = np.column_stack((values[:,:6],
+                            states(table['forest_state']),
+                            values[:,6:10],
+                            states(table['leaks_state']),
+                            moves[:,:2],
+                            keys(table['keys']),
+                            clicks(table['clicks'])))
+    if extras :
+        data = np.column_stack((data, moves[:,2:]))
+    return data, table[['errors', 'shortcuts']].to_numpy(dtype = str)
+
+def cache_path(session) :
+    return os.path.join(cache_dir, str(session) + '.npz')
+
+def clean_record(entry) :
+    # cleans the recording of one manifest entry and saves it, with the
+    # column statistics of its features and derived features, in the cache
+    data, raw = clean_session(entry['path'], extras = True)
+    accumulator = stats.Accumulator(data.shape[1])
+    accumulator.update(data)
+    count, mean, m2 = accumulator.summary
+    np.savez(cache_path(entry['session']), data = data, raw = raw,
+             count = count, mean = mean, m2 = m2)
+    clean_record.count += 1
+    if clean_record.count % progress == 0 :
+        print('Worker', os.getpid(), ':', clean_record.count, 'sessions cleaned')
+    return data, raw
+
+# sessions cleaned by the current process
+clean_record.count = 0
+
+def changes(entries, incremental = False) :
+    # Compares the manifest entries with the cache. Returns the entries to
+    # clean (every one, or only the new and changed recordings when
+    # incremental is set, every one if the cache is of another version)
+    # and the session ids no longer recorded.
+    cached = manifest.load(cache_manifest())
+    current = {entry['session'] : entry['sha1'] for entry in cached if entry.get('version') == str(version)}
+    recorded = set(entry['session'] for entry in entries)
+    removed = sorted(set(entry['session'] for entry in cached) - recorded)
+    if not incremental :
+        return list(entries), removed
+    return [entry for entry in entries if current.get(entry['session']) != entry['sha1']], removed
+
+def sessions(jobs = 1, entries = None) :
+    # Cleans the recordings of the manifest entries (rebuilt from one scan
+    # of records_dir by default) into the cache and yields (session id,
+    # features, raw columns) in session id order. With jobs > 1 sessions
+    # are cleaned by a pool of processes (jobs = 0 uses every core); imap
+    # hands the results back in submission order so the output is the same
+    # as a serial run.
+    if entries is None :
+        entries = manifest.update(records_dir)
+    os.makedirs(cache_dir, exist_ok = True)
+    if jobs == 1 :
+        for entry in entries :
+            yield (entry['session'],) + clean_record(entry)
+        return
+    with multiprocessing.Pool(jobs or None) as pool :
+        results = pool.imap(clean_record, entries, chunksize = 8)
+        for entry, (data, raw) in zip(entries, results) :
+            yield entry['session'], data, raw
+
+def cache_record(entry) :
+    # cleans the recording of one manifest entry into the cache, only its
+    # session id goes back to the caller
+    clean_record(entry)
+    return entry['session']
+
+def cache_sessions(jobs = 1, entries = None) :
+    # Cleans the recordings of the manifest entries (rebuilt from one scan
+    # of records_dir by default) into the cache, like sessions, without
+    # sending their data back from the workers. Returns the session ids
+    # cleaned, in session id order.
+    if entries is None :
+        entries = manifest.update(records_dir)
+    os.makedirs(cache_dir, exist_ok = True)
+    if jobs == 1 :
+        return [cache_record(entry) for entry in entries]
+    with multiprocessing.Pool(jobs or None) as pool :
+        return list(pool.imap(cache_record, entries, chunksize = 8))
+
+def all_sessions(entries, entries_cleaned, jobs = 1) :
+    # yields (session id, features, raw columns, cleaned) for every entry in
+    # session id order: entries_cleaned (taken in the same order from
+    # entries) are cleaned, the other sessions are loaded from the cache
+    cleaned = sessions(jobs, entries_cleaned)
+    sessions_cleaned = set(entry['session'] for entry in entries_cleaned)
+    for entry in entries :
+        if entry['session'] in sessions_cleaned :
+            yield next(cleaned) + (True,)
+        else :
+            yield (entry['session'],) + load_session(entry['session']) + (False,)
+
+def cache_manifest() :
+    # manifest of the recordings the cache was built from, with the version
+    # they were cleaned with
+    return os.path.join(cache_dir, 'manifest.csv')
+
+def source_hash(entries) :
+    # stamp of the stores and statistics cut from the cache: hash of the
+    # recordings and version of their cleaning
+    return '%s-%d' % (manifest.source_hash(entries), version)
+
+def save_cache(entries, removed) :
+    # to call once every entry is cleaned: drops the sessions no longer
+    # recorded and remembers which recordings the cache holds
+    for session in removed :
+        if os.path.exists(cache_path(session)) :
+            os.remove(cache_path(session))
+    manifest.save([dict(entry, version = version) for entry in entries], cache_manifest(), manifest.fields + ['version'])
+
+def load_session(session) :
+    # cleaned_features and raw columns of a cached session
+    with np.load(cache_path(session)) as cached :
+        return cached['data'], cached['raw']
+
+def session_stats(session) :
+    # (count, mean, m2) of the cleaned_features of a cached session
+    with np.load(cache_path(session)) as cached :
+        return int(cached['count']), cached['mean'], cached['m2']
+
+# =============================================================================
+# Breaking down sessions in 10 second sequences
+# =============================================================================
+
+def session_windows(data, size = window, stride = None) :
+    # Rows of each robot mode are taken in order of appearance and cut in
+    # segments wherever remaining_time goes up (a new recording). Windows
+    # of size rows start every stride rows (stride = size: no overlap) from
+    # the start of each segment and must fit in it, so no incomplete window
+    # is ever produced. Returns the robot mode and the row indices
+    # ([windows, size]) of the windows, in order of their first row.
+    stride = stride or size
+    modes, windows = [], []
+    for mode in np.unique(data[:,1]) :
+        rows = np.flatnonzero(data[:,1] == mode)
+        if len(rows) < size :
+            continue
+        new = np.concatenate(([True], np.diff(data[rows,0]) > 0))
+        position = np.arange(len(rows)) - np.maximum.accumulate(np.where(new, np.arange(len(rows)), 0))
+        segment = np.cumsum(new) - 1
+        remaining = np.bincount(segment)[segment] - position
+        starts = np.flatnonzero((position % stride == 0) & (remaining >= size))
+        modes.append(np.full(len(starts), mode))
+        windows.append(sliding_window_view(rows, size)[starts])
+    if not windows :
+        return np.zeros(0), np.zeros((0, size), dtype = int)
+    modes, windows = np.concatenate(modes), np.concatenate(windows)
+    order = np.argsort(windows[:,0], kind = 'stable')
+    return modes[order], windows[order]
+
+def feature_set(spec) :
+    # Name and columns of a feature set, given by name or as a comma separated
+    # list of features or derived features ('robot_x,robot_y,speed'), in the
+    # order of the cleaned_features, the key and click counts last
+    if spec in feature_sets :
+        return spec, feature_sets[spec]
+    names = [name.strip() for name in spec.split(',')]
+    unknown = [name for name in names if name not in cleaned_features]
+    if unknown :
+        raise ValueError('unknown features %s, feature sets : %s' % (unknown, ', '.join(feature_sets)))
+    order = [name for name in cleaned_features if name not in event_features] + event_features
+    names = [name for name in order if name in names]
+    for name, columns in feature_sets.items() :
+        if columns == names :
+            return name, columns
+    return '_'.join(name.replace(' ', '') for name in names), names
+
+def store_folder(folder, name, size = window) :
+    # ../Data/windows_normalized for every feature and 10 row windows, a
+    # folder per feature set and window length otherwise
+    # (../Data/windows_normalized_trajectory, ..._trajectory_30s)
+    if name != 'all' :
+        folder += '_' + name
+    if size != window :
+        folder += '_%ds' % size
+    return folder
+
+def resolutions(sizes, strides = None) :
+    # (size, stride) of every window length of a comma separated list
+    # ('10,30,60'). strides gives one stride per window, or one for all, None
+    # for windows that do not overlap.
+    sizes = [int(size) for size in str(sizes).split(',')]
+    strides = [None] if strides is None else [int(stride) for stride in str(strides).split(',')]
+    if len(strides) == 1 :
+        strides = strides*len(sizes)
+    if len(strides) != len(sizes) :
+        raise ValueError('%d strides for %d window lengths' % (len(strides), len(sizes)))
+    return list(zip(sizes, strides))
+
+def handover_windows(data, size = window) :
+    # Windows of size rows centred on every robot_mode change of a session
+    # (the first row of the new mode is row size//2 of the window). A window
+    # must fit in the session and may not cross the start of another
+    # recording, nor may the change itself. Returns the direction (1 : human
+    # to autonomous, -1 : autonomous to human), the offset of the change in
+    # the window and the row indices ([windows, size]) of the windows.
+    recording = np.concatenate(([0], np.cumsum(np.diff(data[:,0]) > 0)))
+    changes = np.flatnonzero(np.diff(data[:,1]) != 0) + 1
+    offset = size//2
+    starts = changes - offset
+    inside = (starts >= 0) & (starts + size <= len(data))
+    changes, starts = changes[inside], starts[inside]
+    inside = recording[starts] == recording[starts + size - 1]
+    changes, starts = changes[inside], starts[inside]
+    direction = np.sign(data[changes,1] - data[changes - 1,1]).astype(int)
+    return direction, np.full(len(starts), offset), starts[:,None] + np.arange(size)
+
+class WindowWriter :
+    # Writes windows as <i>.csv in one folder. windows.csv keeps the session
+    # of every file, so the windows of a session can be replaced. Unless
+    # incremental is set, the windows of a previous run are removed first.
+    def __init__(self, folder, columns = header, incremental = False) :
+        self.folder = folder
+        self.columns = columns
+        self.index = os.path.join(folder, 'windows.csv')
+        os.makedirs(folder, exist_ok = True)
+        self.sessions = {}
+        if os.path.exists(self.index) :
+            with open(self.index, 'r', newline = '') as file :
+                reader = csv.reader(file, delimiter=',')
+                next(reader)
+                self.sessions = {int(i) : int(session) for i, session in reader}
+        if not incremental :
+            self.remove(set(self.sessions.values()))
+        self.count = max(self.sessions, default = -1) + 1
+
+    def path(self, i) :
+        return os.path.join(self.folder, str(i) + '.csv')
+
+    def remove(self, sessions) :
+        # deletes the windows of the given sessions
+        for i in [i for i, session in self.sessions.items() if session in sessions] :
+            if os.path.exists(self.path(i)) :
+                os.remove(self.path(i))
+            del self.sessions[i]
+
+    def write(self, rows, session) :
+        with open(self.path(self.count),'w',newline='') as newfile :
+            writer = csv.writer(newfile,delimiter=',')
+            writer.writerow(self.columns)
+            for row in rows :
+                writer.writerow(row)
+        self.sessions[self.count] = session
+        self.count += 1
+
+    def close(self) :
+        with open(self.index,'w',newline='') as newfile :
+            writer = csv.writer(newfile,delimiter=',')
+            writer.writerow(['window', 'session'])
+            writer.writerows(sorted(self.sessions.items()))
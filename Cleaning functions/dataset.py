@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Training dataset of the GANs.
+
+TrajectoryDataset reads the windows of a packed store (window_store) once
+into a single float32 tensor of [windows, 1, rows, columns] samples, the
+[1, 10, 3] robot_x, robot_y, robot_theta images of the DCGAN generator and
+discriminator by default. Fetching a sample is a slice of that tensor, no
+file is opened during training. With labels set (CDCGAN) the robot_mode of
+every window, read from the same store index, is kept as an int8 label
+(1 autonomous, 0 human) returned with the window.
+
+The folder may also be a folder of csv windows of one robot_mode (--csv),
+read through the binary cache of window_cache.
+
+    data_sets = dataset.TrajectoryDataset('../Data/windows_normalized_trajectory', mode = 1)
+    dataloader = dataset.TensorBatches(data_sets, batch_size, shuffle = True)
+
+TensorBatches takes the place of a DataLoader : each batch is one slice
+(or one indexing by a shuffled permutation, drawn once per epoch) of the
+dataset tensors instead of batch_size __getitem__ calls and a collate.
+"""
+
+import numpy as np
+import os
+import math
+import torch
+import window_store
+import window_cache
+
+trajectory = ['robot_x', 'robot_y', 'robot_theta']
+
+class TrajectoryDataset(torch.utils.data.Dataset) :
+    # Windows of the named columns of a store, of one robot_mode (both if
+    # None), only the windows of ids if given (metadata.windows). Samples
+    # are (window,) tuples like a TensorDataset, (window, label) with
+    # labels, the label a [1, 1, 1] int8 tensor. A csv window folder holds
+    # the windows of mode, selected on their file numbers with ids.
+    def __init__(self, folder, mode = None, names = trajectory, ids = None, labels = False) :
+        if os.path.exists(os.path.join(folder, 'store.json')) :
+            windows, index, columns = window_store.load(folder, mode, ids = ids)
+            windows = window_store.select(windows, index, columns, list(names))
+        else :
+            if mode is None and labels :
+                raise ValueError('the robot_mode of the csv windows of %s must be given' % folder)
+            windows, files = window_cache.load(folder, names)
+            if ids is not None :
+                keep = np.isin(files, ids)
+                windows, files = windows[keep], files[keep]
+            index = {'file' : files, 'robot_mode' : np.full(len(files), -1 if mode is None else mode)}
+        self.data = torch.from_numpy(np.array(windows, dtype = np.float32)).unsqueeze(1)
+        self.index = index
+        self.columns = list(names)
+        # one byte per window
+        self.labels = torch.from_numpy((index['robot_mode'] > 0).astype(np.int8)).view(-1, 1, 1, 1) if labels else None
+
+    def __len__(self) :
+        return len(self.data)
+
+    def __getitem__(self, i) :
+        if self.labels is None :
+            return (self.data[i],)
+        return self.data[i], self.labels[i]
+
+class TensorBatches :
+    # Iterates over the batches of a TrajectoryDataset like a DataLoader,
+    # as [windows] or [windows, labels] lists. Unshuffled batches are views
+    # of the dataset tensors, shuffled ones are gathered with one index
+    # operation per tensor.
+    def __init__(self, data_set, batch_size, shuffle = False, drop_last = False, generator = None) :
+        self.tensors = [data_set.data] + ([data_set.labels] if data_set.labels is not None else [])
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.generator = generator
+
+    def __len__(self) :
+        count = len(self.tensors[0])/self.batch_size
+        return int(count) if self.drop_last else math.ceil(count)
+
+    def __iter__(self) :
+        count = len(self.tensors[0])
+        order = torch.randperm(count, generator = self.generator) if self.shuffle else None
+        for first in range(0, len(self)*self.batch_size, self.batch_size) :
+            if order is None :
+                yield [tensor[first:first + self.batch_size] for tensor in self.tensors]
+            else :
+                batch = order[first:first + self.batch_size]
+                yield [tensor[batch] for tensor in self.tensors]
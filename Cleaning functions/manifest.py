@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Session manifest of the recorded data folder.
+
+One scan of the folder lists every FRGrecord_<i>.csv with its size,
+modification time, number of rows and content hash. The manifest is kept
+as a csv file next to the folder, so files that did not change since the
+last scan are not read again.
+"""
+
+import os
+import re
+import csv
+import hashlib
+
+fields = ['session', 'path', 'size', 'mtime', 'rows', 'sha1']
+
+record_name = re.compile(r'FRGrecord_(\d+)\.csv$')
+
+def manifest_path(folder) :
+    # ../Data/recorded_csv_data2 -> ../Data/recorded_csv_data2_manifest.csv
+    return os.path.normpath(folder) + '_manifest.csv'
+
+def describe(path) :
+    # number of rows (header excluded) and sha1 of one file
+    with open(path, 'rb') as file :
+        content = file.read()
+    rows = max(len(content.splitlines()) - 1, 0)
+    return rows, hashlib.sha1(content).hexdigest()
+
+def load(path) :
+    # entries of a saved manifest, an empty list if there is none yet
+    try :
+        with open(path, 'r', newline = '') as file :
+            entries = list(csv.DictReader(file))
+    except FileNotFoundError :
+        return []
+    for entry in entries :
+        for field in ['session', 'size', 'mtime', 'rows'] :
+            entry[field] = int(entry[field])
+    return entries
+
+def save(entries, path, columns = fields) :
+    with open(path, 'w', newline = '') as file :
+        writer = csv.DictWriter(file, fieldnames = columns)
+        writer.writeheader()
+        writer.writerows(entries)
+
+def scan(folder, previous = ()) :
+    # Lists the recordings of the folder in session id order. Files with
+    # the same size and mtime as in the previous manifest keep their rows
+    # and hash, the others are read and hashed.
+    known = {entry['path'] : entry for entry in previous}
+    entries = []
+    with os.scandir(folder) as files :
+        for file in files :
+            match = record_name.match(file.name)
+            if match is None or not file.is_file() :
+                continue
+            stat = file.stat()
+            entry = known.get(file.path)
+            if entry is None or entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime_ns :
+                rows, sha1 = describe(file.path)
+                entry = {'session' : int(match.group(1)), 'path' : file.path,
+                         'size' : stat.st_size, 'mtime' : stat.st_mtime_ns,
+                         'rows' : rows, 'sha1' : sha1}
+            entries.append(entry)
+    entries.sort(key = lambda entry : entry['session'])
+    return entries
+
+def source_hash(entries) :
+    # hash of the session ids and sha1 of the recordings of a manifest
+    source = hashlib.sha1()
+    for entry in entries :
+        source.update(('%d %s\n' % (entry['session'], entry['sha1'])).encode())
+    return source.hexdigest()
+
+def update(folder) :
+    # scans the folder, saves and returns its manifest
+    path = manifest_path(folder)
+    entries = scan(folder, load(path))
+    save(entries, path)
+    return entries
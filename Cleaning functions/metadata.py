@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Session and window metadata index of a window store.
+
+The cleaning scripts describe every session and every window they pack in
+a small SQLite database (metadata.sqlite, next to store.json), so training
+data can be selected on more than robot_mode without cleaning again :
+
+    ids = metadata.windows('../Data/windows_normalized_trajectory', 'battery_min < 20 AND alarms > 0')
+    windows, index, columns = window_store.load('../Data/windows_normalized_trajectory', ids = ids)
+
+Columns of the sessions table : session, duration (seconds, one row per
+second), autonomous (fraction of rows in robot_mode 1), alarms (alarms raised),
+alarm_rows, battery_min, trees, leaks (mean number of trees and leaks in
+state 1), trees_max, leaks_max, x_min, x_max, y_min, y_max.
+The windows table has the same columns per window, duration aside, plus
+window (id, the position of the window in window_store.load),
+robot_mode and start_time.
+"""
+
+import os
+import sqlite3
+import numpy as np
+from cleaning import features
+
+database = 'metadata.sqlite'
+
+summary_fields = ['autonomous', 'alarms', 'alarm_rows', 'battery_min', 'trees', 'leaks',
+                  'trees_max', 'leaks_max', 'x_min', 'x_max', 'y_min', 'y_max']
+session_fields = ['session', 'duration'] + summary_fields
+window_fields = ['window', 'session', 'robot_mode', 'start_time'] + summary_fields
+
+trees = [features.index('tree %d' % i) for i in range(1, 10)]
+leaks = [features.index('leak %d' % i) for i in range(1, 10)]
+
+def summarize(data) :
+    # summary_fields of [..., rows, 49] cleaned (not normalized) features,
+    # one value per leading index, as a list of columns
+    alarm = data[...,2] >= 0
+    raised = alarm[...,0] + (alarm[...,1:] & ~alarm[...,:-1]).sum(axis = -1)
+    tree_count = data[...,trees].sum(axis = -1)
+    leak_count = data[...,leaks].sum(axis = -1)
+    return [data[...,1].mean(axis = -1), raised, alarm.sum(axis = -1), data[...,15].min(axis = -1),
+            tree_count.mean(axis = -1), leak_count.mean(axis = -1), tree_count.max(axis = -1), leak_count.max(axis = -1),
+            data[...,3].min(axis = -1), data[...,3].max(axis = -1), data[...,4].min(axis = -1), data[...,4].max(axis = -1)]
+
+def plain(values) :
+    # numpy scalars as python numbers for sqlite
+    return [np.asarray(value).item() for value in values]
+
+class MetadataWriter :
+    # Writes the metadata of the sessions and windows given to write to
+    # folder/metadata.sqlite, chunk rows at a time (windows wait in a
+    # temporary table), so its memory does not grow with the sessions.
+    # Window ids follow the order of window_store.load : partitions in
+    # robot_mode order, windows in order of writing inside a partition, and
+    # are given on close.
+    def __init__(self, folder, chunk = 65536) :
+        self.path = os.path.join(folder, database)
+        self.chunk = chunk
+        self.sessions = []
+        self.windows = []
+        self.counts = {}
+        if os.path.exists(self.path) :
+            os.remove(self.path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE sessions (%s)' % ', '.join(session_fields))
+        self.connection.execute('CREATE TEMP TABLE pending (position, %s)' % ', '.join(window_fields[1:]))
+
+    def write(self, session, data, modes, rows) :
+        # data : [rows, 49] features of the session, modes and rows the
+        # robot_mode and row indices ([windows, size]) of its windows
+        values = summarize(data[None,:,:len(features)]) if len(data) else [[0]]*len(summary_fields)
+        self.sessions.append(plain([session, len(data)] + [value[0] for value in values]))
+        # summarized chunk rows at a time
+        step = max(1, self.chunk//max(1, rows.shape[-1]))
+        for first in range(0, len(rows), step) :
+            values = summarize(data[rows[first:first + step]][:,:,:len(features)])
+            for i, mode in enumerate(modes[first:first + step].astype(int).tolist()) :
+                position = self.counts.get(mode, 0)
+                self.counts[mode] = position + 1
+                self.windows.append(plain([position, session, mode, data[rows[first + i,0],0]] + [value[i] for value in values]))
+            if len(self.windows) >= self.chunk :
+                self.flush()
+
+    def flush(self) :
+        with self.connection :
+            self.connection.executemany('INSERT INTO sessions VALUES (%s)' % ', '.join('?'*len(session_fields)), self.sessions)
+            self.connection.executemany('INSERT INTO pending VALUES (%s)' % ', '.join('?'*len(window_fields)), self.windows)
+        self.sessions, self.windows = [], []
+
+    def close(self) :
+        self.flush()
+        # first window id of each partition
+        first, offsets = 0, []
+        for mode in sorted(self.counts) :
+            offsets.append((mode, first))
+            first += self.counts[mode]
+        with self.connection :
+            self.connection.execute('CREATE TEMP TABLE offsets (robot_mode, first)')
+            self.connection.executemany('INSERT INTO offsets VALUES (?, ?)', offsets)
+            self.connection.execute('CREATE TABLE windows (window INTEGER PRIMARY KEY, %s)' % ', '.join(window_fields[1:]))
+            self.connection.execute('INSERT INTO windows SELECT first + position, %s FROM pending JOIN offsets USING (robot_mode) ORDER BY 1'
+                                    % ', '.join('pending.' + field for field in window_fields[1:]))
+            self.connection.execute('CREATE INDEX windows_session ON windows (session)')
+        self.connection.close()
+
+def query(folder, sql, parameters = ()) :
+    # rows of an SQL query on the metadata of a store
+    connection = sqlite3.connect(os.path.join(folder, database))
+    try :
+        return connection.execute(sql, parameters).fetchall()
+    finally :
+        connection.close()
+
+def windows(folder, where = None, sessions_where = None, parameters = ()) :
+    # Ids (sorted) of the windows matching the predicate where, from the
+    # sessions matching sessions_where (an SQL expression on the columns of
+    # each table, '?' taking the parameters in order)
+    conditions = []
+    if where :
+        conditions.append('(%s)' % where)
+    if sessions_where :
+        conditions.append('session IN (SELECT session FROM sessions WHERE %s)' % sessions_where)
+    sql = 'SELECT window FROM windows' + (' WHERE ' + ' AND '.join(conditions) if conditions else '') + ' ORDER BY window'
+    return np.array([row[0] for row in query(folder, sql, parameters)], dtype = int)
+
+def sessions(folder, where = None, parameters = ()) :
+    # ids of the sessions matching the predicate where
+    sql = 'SELECT session FROM sessions' + (' WHERE %s' % where if where else '') + ' ORDER BY session'
+    return np.array([row[0] for row in query(folder, sql, parameters)], dtype = int)
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Normalization statistics of the cleaned data.
+
+DataCleaning_STD saves the column names, mean, standard deviation and row
+count it normalized the windows with, and the hash of the recordings they
+were computed on, in ../Data/normalization_stats.json. The generated
+samples are denormalized with them, without reading the dataset again.
+"""
+
+import os
+import json
+import numpy as np
+
+version = 1
+
+# ../Data/normalization_stats.json from this folder, so it is found from
+# every script folder (DCGAN, Validation, Others, ...)
+stats_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data', 'normalization_stats.json')
+
+def save(columns, mean, std, count, source, path = stats_path) :
+    with open(path, 'w') as file :
+        json.dump({'version' : version, 'columns' : list(columns),
+                   'mean' : [float(value) for value in mean],
+                   'std' : [float(value) for value in std],
+                   'count' : int(count), 'source' : source}, file, indent = 1)
+
+class Normalizer :
+    # mean and std of named columns, applied along one axis of an array
+    def __init__(self, columns, mean, std, count = 0, source = '') :
+        self.columns = list(columns)
+        self.mean = np.asarray(mean, dtype = float)
+        self.std = np.asarray(std, dtype = float)
+        self.count = count
+        self.source = source
+
+    def select(self, names = None) :
+        # mean and std of the named columns (all if None), in that order
+        if names is None :
+            return self.mean, self.std
+        index = [self.columns.index(name) for name in names]
+        return self.mean[index], self.std[index]
+
+    def along(self, values, ndim, axis) :
+        # values of the columns broadcast along axis of an ndim array
+        shape = [1]*ndim
+        shape[axis] = len(values)
+        return values.reshape(shape)
+
+    def normalize(self, data, names = None, axis = -1) :
+        data = np.asarray(data, dtype = float)
+        mean, std = self.select(names)
+        return (data - self.along(mean, data.ndim, axis))/self.along(std, data.ndim, axis)
+
+    def denormalize(self, data, names = None, axis = -1) :
+        # data has one entry per named column along axis, e.g. [rows, 3] or
+        # [samples, 3, rows, 1] (axis = 1) for robot_x, robot_y, robot_theta
+        data = np.asarray(data, dtype = float)
+        mean, std = self.select(names)
+        return data*self.along(std, data.ndim, axis) + self.along(mean, data.ndim, axis)
+
+loaded = {}
+
+def load(path = stats_path) :
+    # Normalizer saved by DataCleaning_STD, read once per modification
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in loaded :
+        with open(path, 'r') as file :
+            description = json.load(file)
+        if description.get('version') != version :
+            raise ValueError('%s has version %s, expected %d, run DataCleaning_STD again' % (path, description.get('version'), version))
+        loaded[key] = Normalizer(description['columns'], description['mean'], description['std'],
+                                 description['count'], description['source'])
+    return loaded[key]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Raw FRGrecord_<i>.csv format and its reader.
+
+Each recording has one row per second and 16 columns, read with the types
+of schema :
+    remaining_time, robot_mode, alarm, robot_x, robot_y, robot_theta,
+    battery_level, temperature, water_robot_tank, water_ground_tank
+        numbers (alarm is -1 when no alarm is raised)
+    forest_state, leaks_state
+        bitfields, 9 digits 0/1 written as a space padded string (' 000000000')
+    keys, clicks
+        actions of the row run together (' leftleftspace'), ' -1' for none
+        (no action token in it, the cleaning counts 0 actions)
+    errors, shortcuts
+        kept as written, '-2' for none
+
+The file is parsed by the pandas C engine with the columns typed up front,
+numbers with the same rounding as float(). Malformed rows (wrong number of
+fields, an empty value, a number that does not parse, a bitfield that is
+not 1 to 9 digits 0/1) are dropped and reported, by their line in the file,
+instead of stopping the cleaning.
+"""
+
+import re
+import warnings
+import numpy as np
+import pandas as pd
+
+schema = [('remaining_time', 'float64'), ('robot_mode', 'float64'), ('alarm', 'float64'),
+          ('robot_x', 'float64'), ('robot_y', 'float64'), ('robot_theta', 'float64'),
+          ('forest_state', 'bitfield'), ('battery_level', 'float64'), ('temperature', 'float64'),
+          ('water_robot_tank', 'float64'), ('water_ground_tank', 'float64'), ('leaks_state', 'bitfield'),
+          ('keys', 'str'), ('clicks', 'str'), ('errors', 'str'), ('shortcuts', 'str')]
+columns = [name for name, dtype in schema]
+numbers = [name for name, dtype in schema if dtype == 'float64']
+bitfields = [name for name, dtype in schema if dtype == 'bitfield']
+
+# a bitfield : up to 9 states 0/1, space padded
+bitfield = r'\s*[01]{1,9}'
+skipped_line = re.compile(r'Skipping line (\d+): (.*)')
+
+def parse(path, dtype) :
+    # pandas C parser, rows with too many fields are skipped with a warning.
+    # Blank lines are kept (as rows of empty values) so every row of the
+    # table is a line of the file.
+    with warnings.catch_warnings(record = True) as caught :
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        table = pd.read_csv(path, engine = 'c', header = 0, names = columns, dtype = dtype, na_filter = False,
+                            float_precision = 'round_trip', on_bad_lines = 'warn', skip_blank_lines = False)
+    skipped = {}
+    for warning in caught :
+        if issubclass(warning.category, pd.errors.ParserWarning) :
+            for line, reason in skipped_line.findall(str(warning.message)) :
+                skipped[int(line)] = reason.strip()
+    return table, skipped
+
+def read_record(path) :
+    # Reads one FRGrecord file. Returns a DataFrame of the schema columns,
+    # numbers as float64 and the others as strings, and the malformed rows
+    # left out, as 'Skipping line <line of the file>: <reason>' messages.
+    try :
+        table, skipped = parse(path, {name : (dtype if dtype == 'float64' else object) for name, dtype in schema})
+        unparsed = np.zeros(len(table), dtype = bool)
+        text = [name for name in columns if name not in numbers]
+    except ValueError :
+        # a number does not parse : read everything as text
+        table, skipped = parse(path, object)
+        unparsed = table[numbers].apply(pd.to_numeric, errors = 'coerce').isna().any(axis = 1).to_numpy()
+        text = columns
+    # line of every row, the header being line 1
+    lines = np.setdiff1d(np.arange(2, 2 + len(table) + len(skipped)), list(skipped))
+    # a row cut short gets empty values for its missing fields
+    empty = (table[text] == '').any(axis = 1).to_numpy()
+    # reason of each malformed row, the most basic one is kept
+    reasons = {}
+    for name in bitfields[::-1] :
+        # few distinct states in a recording, each is matched once
+        values = pd.unique(table[name].to_numpy())
+        invalid = [value for value in values if not re.fullmatch(bitfield, str(value))]
+        for row in np.flatnonzero(table[name].isin(invalid).to_numpy()) :
+            reasons[row] = '%s %r is not a bitfield of 1 to 9 states' % (name, table[name].iloc[row])
+    for row in np.flatnonzero(unparsed) :
+        reasons[row] = 'a number does not parse'
+    for row in np.flatnonzero(empty) :
+        reasons[row] = 'expected %d fields, some are missing or empty' % len(columns)
+    skipped.update((int(lines[row]), reason) for row, reason in reasons.items())
+    malformed = ['Skipping line %d: %s' % (line, reason) for line, reason in sorted(skipped.items())]
+    if reasons :
+        table = table.drop(index = table.index[list(reasons)]).reset_index(drop = True)
+        table[numbers] = table[numbers].astype(float)
+    return table, malformed
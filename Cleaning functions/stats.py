@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Mergeable column statistics used to standardize the cleaned data.
+
+A summary is (count, mean, m2), m2 being the sum of the squared deviations
+from the mean of every column. Summaries of separate chunks, sessions or
+workers are merged without going back to their rows (Chan et al. pairwise
+update), so the statistics of a dataset larger than memory are computed
+one chunk at a time.
+"""
+
+import numpy as np
+
+def describe(data) :
+    # summary of the columns of a [rows, columns] array
+    data = np.asarray(data, dtype = float)
+    mean = data.mean(axis = 0) if len(data) else np.zeros(data.shape[1])
+    return len(data), mean, ((data - mean)**2).sum(axis = 0)
+
+def merge(a, b) :
+    # summary of the rows of a and b together
+    count_a, mean_a, m2_a = a
+    count_b, mean_b, m2_b = b
+    count = count_a + count_b
+    if count == 0 :
+        return a
+    delta = mean_b - mean_a
+    mean = mean_a + delta*count_b/count
+    m2 = m2_a + m2_b + delta**2*count_a*count_b/count
+    return count, mean, m2
+
+def mean_std(summary) :
+    # mean and (population) standard deviation, as np.mean and np.std
+    count, mean, m2 = summary
+    return mean, np.sqrt(m2/count)
+
+class Accumulator :
+    # Running summary of the columns of the chunks given to update(), the
+    # summaries of other sessions or workers are added with merge()
+    def __init__(self, columns, chunk = 65536) :
+        self.summary = (0, np.zeros(columns), np.zeros(columns))
+        self.chunk = chunk
+
+    def update(self, data) :
+        # rows are taken chunk rows at a time to bound the temporary arrays
+        for start in range(0, len(data), self.chunk) :
+            self.merge(describe(data[start:start + self.chunk]))
+
+    def merge(self, summary) :
+        self.summary = merge(self.summary, summary)
+
+    def mean_std(self) :
+        return mean_std(self.summary)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar binary table of the cleaned data.
+
+Every column of the cleaned sessions is written one after the other in its
+own typed file (<column>.bin in ../Data/cleaned_table): int8 for robot_mode,
+the alarm, the tree and leak states and the key and click counts, float32
+for the continuous signals. table.json gives the columns, their type and
+the number of rows, sessions.csv the first row and number of rows of every
+session, in session id order. A reader only maps the columns and the
+sessions it asks for.
+"""
+
+import os
+import csv
+import json
+import numpy as np
+
+# Folder of the cleaned table written by Clean_Split and DataCleaning_STD
+table_dir = '../Data/cleaned_table'
+
+session_fields = ['session', 'start', 'rows']
+
+def column_type(name) :
+    # int8 for the flags and counts, float32 for everything else
+    if name in ('robot_mode', 'alarm') or name.split(' ')[0] in ('tree', 'leak', 'key', 'click') :
+        return 'int8'
+    return 'float32'
+
+def column_file(folder, name) :
+    return os.path.join(folder, name.replace(' ', '_') + '.bin')
+
+class TableWriter :
+    # appends the [rows, columns] features of each session to the table
+    def __init__(self, folder, columns) :
+        self.folder = folder
+        self.columns = list(columns)
+        self.types = [column_type(name) for name in self.columns]
+        self.sessions = []
+        self.rows = 0
+        os.makedirs(folder, exist_ok = True)
+        # the description is written last, a table without one is incomplete
+        if os.path.exists(os.path.join(folder, 'table.json')) :
+            os.remove(os.path.join(folder, 'table.json'))
+        self.files = [open(column_file(folder, name), 'wb') for name in self.columns]
+
+    def write(self, data, session) :
+        if data.shape[1] != len(self.columns) :
+            raise ValueError('%d columns, expected %d' % (data.shape[1], len(self.columns)))
+        for i, (file, dtype) in enumerate(zip(self.files, self.types)) :
+            column = data[:,i].astype(dtype)
+            if dtype == 'int8' and np.any(column != data[:,i]) :
+                raise ValueError('column %s of session %d does not fit in int8' % (self.columns[i], session))
+            file.write(column.tobytes())
+        self.sessions.append((session, self.rows, len(data)))
+        self.rows += len(data)
+
+    def close(self) :
+        for file in self.files :
+            file.close()
+        with open(os.path.join(self.folder, 'sessions.csv'), 'w', newline = '') as file :
+            writer = csv.writer(file, delimiter=',')
+            writer.writerow(session_fields)
+            writer.writerows(self.sessions)
+        with open(os.path.join(self.folder, 'table.json'), 'w') as file :
+            json.dump({'columns' : self.columns, 'types' : self.types, 'rows' : self.rows}, file, indent = 1)
+
+def load(folder = table_dir, names = None, sessions = None) :
+    # Memory maps the named columns (all if None) of a table. Returns a dict
+    # column -> [rows] array and the sessions as a dict of arrays (session,
+    # start, rows). The other columns are not opened, and only the rows of
+    # the sessions first to last (sessions = (first, last), every session if
+    # None) are mapped, start is then counted from the first of them.
+    with open(os.path.join(folder, 'table.json'), 'r') as file :
+        description = json.load(file)
+    types = dict(zip(description['columns'], description['types']))
+    table = np.loadtxt(os.path.join(folder, 'sessions.csv'), delimiter = ',', skiprows = 1, ndmin = 2, dtype = int).reshape(-1, 3)
+    if sessions is not None :
+        table = table[np.searchsorted(table[:,0], sessions[0]):np.searchsorted(table[:,0], sessions[1] + 1)]
+    first, rows = (table[0,1], table[:,2].sum()) if len(table) else (0, 0)
+    columns = {}
+    for name in names if names is not None else description['columns'] :
+        if name not in types :
+            raise KeyError('no column %r in %s' % (name, folder))
+        if rows :
+            columns[name] = np.memmap(column_file(folder, name), dtype = types[name], mode = 'r',
+                                      offset = int(first)*np.dtype(types[name]).itemsize, shape = (int(rows),))
+        else :
+            columns[name] = np.zeros(0, dtype = types[name])
+    table[:,1] -= first
+    return columns, dict(zip(session_fields, table.T))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Binary cache of the csv window folders.
+
+The first read of a folder of <i>.csv windows (written with --csv, or by
+the older cleaning scripts) parses every file once and saves the windows
+of the columns asked for as one float32 [windows, rows, columns] array,
+cache_<key>.npy in the folder, <key> being a hash of the column names.
+cache_<key>.json next to it keeps the fingerprint of the folder : the
+columns and the name, size and modification time of every window file.
+Later reads scan the folder, compare the fingerprint and load the array
+memory mapped in a few milliseconds. A new, removed or changed file makes
+the next read parse the folder again.
+
+    windows, files = window_cache.load('../Data/Autonomous data/original data', ['robot_x', 'robot_y', 'robot_theta'])
+"""
+
+import os
+import re
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+window_name = re.compile(r'(\d+)\.csv$')
+
+def window_files(folder) :
+    # (number, name, size, mtime) of the <i>.csv files of folder, in number order
+    files = []
+    with os.scandir(folder) as scan :
+        for file in scan :
+            match = window_name.match(file.name)
+            if match and file.is_file() :
+                stat = file.stat()
+                files.append((int(match.group(1)), file.name, stat.st_size, stat.st_mtime_ns))
+    return sorted(files)
+
+def cache_path(folder, names) :
+    key = hashlib.sha1(json.dumps(list(names)).encode()).hexdigest()[:12]
+    return os.path.join(folder, 'cache_' + key)
+
+def fingerprint(files, names) :
+    return hashlib.sha1(json.dumps([list(names), [file[1:] for file in files]]).encode()).hexdigest()
+
+def parse(folder, files, names) :
+    # [windows, rows, columns] float32 array of the named columns of the files
+    windows = [pd.read_csv(os.path.join(folder, name), usecols = names, engine = 'c')[names].to_numpy(np.float32)
+               for number, name, size, mtime in files]
+    if len(set(window.shape for window in windows)) > 1 :
+        raise ValueError('windows of %s do not all have the same number of rows' % folder)
+    return np.stack(windows) if windows else np.zeros((0, 0, len(names)), dtype = np.float32)
+
+def load(folder, names) :
+    # Windows of the named columns of a csv window folder (memory mapped
+    # from the cache when it is current) and the number of their files
+    names = list(names)
+    files = window_files(folder)
+    path = cache_path(folder, names)
+    key = fingerprint(files, names)
+    try :
+        with open(path + '.json', 'r') as file :
+            current = json.load(file)['fingerprint'] == key
+    except FileNotFoundError :
+        current = False
+    if not current :
+        np.save(path + '.npy', parse(folder, files, names))
+        # the fingerprint is written last, a cache without one is rebuilt
+        with open(path + '.json', 'w') as file :
+            json.dump({'columns' : names, 'windows' : len(files), 'fingerprint' : key}, file, indent = 1)
+    return np.load(path + '.npy', mmap_mode = 'r'), np.array([file[0] for file in files], dtype = int)
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+Packed window store, partitioned by robot_mode.
+
+The windows of each robot_mode are written one after the other in a single
+float32 file (robot_mode=<mode>/windows.f32, or windows.f16 for a float16
+store, half the size), read back as one memory mapped [windows, rows,
+columns] array. Sessions are written in session id order,
+so the windows of a session range are a contiguous slice of that file. The
+index.csv of a partition gives the session id and start time
+(remaining_time of the first row) of its windows, and the extra fields of
+the store if any, store.json the column names, the shape, the windows of
+every partition and the hash of the recordings the windows were cut from.
+
+The key and click counts, almost always 0, are not stored as dense floats
+but as a list of events per window row (events.u8 : number of events of
+each row, event_columns.u8 and event_counts.i8 : column and count of each
+event). The reader densifies them on demand, normalized again with the mean
+and std kept in store.json.
+
+A reader only opens the partitions of the robot_mode it asks for and only
+maps the part of them holding the sessions it asks for.
+"""
+
+import os
+import csv
+import json
+import numpy as np
+
+index_fields = ['session', 'start_time', 'robot_mode']
+# types the windows can be stored as
+dtypes = ['float32', 'float16']
+
+def partition(folder, mode) :
+    return os.path.join(folder, 'robot_mode=%d' % mode)
+
+def windows_file(dtype) :
+    return 'windows.f%d' % (8*np.dtype(dtype).itemsize)
+
+class WindowStore :
+    # appends windows of size rows and len(columns) columns to a store, with
+    # optional extra fields (numbers) per window in the index. The last
+    # columns, events, are kept as event lists of their raw counts, restored
+    # as (count - mean)/std (raw counts if scale is None) by load. The
+    # windows are stored as dtype (float32 or float16).
+    def __init__(self, folder, columns, size, stride = None, source = '', fields = (), events = (), scale = None,
+                 dtype = 'float32') :
+        if dtype not in dtypes :
+            raise ValueError('windows stored as %s, expected one of %s' % (dtype, dtypes))
+        self.folder = folder
+        self.dtype = dtype
+        self.columns = list(columns)
+        self.size = size
+        self.stride = stride or size
+        self.source = source
+        self.fields = list(fields)
+        self.events = list(events)
+        if self.events and self.columns[-len(self.events):] != self.events :
+            raise ValueError('event columns %s are not the last columns' % self.events)
+        self.dense = len(self.columns) - len(self.events)
+        self.scale = scale if scale is not None else (np.zeros(len(self.events)), np.ones(len(self.events)))
+        self.files = {}
+        self.indexes = {}
+        self.counts = {}
+        self.count = 0
+        self.last = None
+        os.makedirs(folder, exist_ok = True)
+        # the description is written last, a store without one is incomplete
+        if os.path.exists(os.path.join(folder, 'store.json')) :
+            os.remove(os.path.join(folder, 'store.json'))
+
+    def open(self, mode) :
+        os.makedirs(partition(self.folder, mode), exist_ok = True)
+        # windows of a previous run stored as another type
+        for dtype in dtypes :
+            if dtype != self.dtype and os.path.exists(os.path.join(partition(self.folder, mode), windows_file(dtype))) :
+                os.remove(os.path.join(partition(self.folder, mode), windows_file(dtype)))
+        names = [windows_file(self.dtype)] + (['events.u8', 'event_columns.u8', 'event_counts.i8'] if self.events else [])
+        self.files[mode] = [open(os.path.join(partition(self.folder, mode), name), 'wb') for name in names]
+        # the index is written as the windows come, nothing grows in memory
+        self.files[mode].append(open(os.path.join(partition(self.folder, mode), 'index.csv'), 'w', newline = ''))
+        self.indexes[mode] = csv.writer(self.files[mode][-1], delimiter=',')
+        self.indexes[mode].writerow(index_fields[:2] + self.fields)
+        self.counts[mode] = 0
+
+    def write(self, data, session, start_times, modes, extra = (), events = None) :
+        # appends a [windows, size, columns] batch of windows of one session
+        # (the columns before the event columns, their raw counts given as
+        # events : [windows, size, event columns]), starting at the given
+        # remaining_times, with their robot_modes (and one array per extra
+        # field), to the partition of each mode
+        data = np.ascontiguousarray(data, dtype = self.dtype)
+        if data.shape[1:] != (self.size, self.dense) :
+            raise ValueError('windows of shape %s, expected (n, %d, %d)' % (data.shape, self.size, self.dense))
+        if self.events :
+            events = np.asarray(events).reshape(len(data), self.size, len(self.events))
+        if self.last is not None and session < self.last :
+            raise ValueError('session %d written after session %d' % (session, self.last))
+        self.last = session
+        start_times = np.broadcast_to(start_times, len(data))
+        modes = np.broadcast_to(modes, len(data)).astype(int)
+        extra = np.column_stack([np.broadcast_to(values, len(data)) for values in extra]) if self.fields else np.zeros((len(data), 0))
+        for mode in np.unique(modes).tolist() :
+            if mode not in self.files :
+                self.open(mode)
+            selected = modes == mode
+            files = self.files[mode]
+            files[0].write(data[selected].tobytes())
+            if self.events :
+                counts = events[selected].reshape(-1, len(self.events))
+                rows, columns = np.nonzero(counts)
+                values = counts[rows, columns].astype(np.int8)
+                if np.any(values != counts[rows, columns]) :
+                    raise ValueError('event counts of session %d do not fit in int8' % session)
+                files[1].write((counts != 0).sum(axis = 1).astype(np.uint8).tobytes())
+                files[2].write(columns.astype(np.uint8).tobytes())
+                files[3].write(values.tobytes())
+            self.indexes[mode].writerows([session, start_time] + values
+                                         for start_time, values in zip(start_times[selected].tolist(), extra[selected].tolist()))
+            self.counts[mode] += int(selected.sum())
+        self.count += len(data)
+
+    def close(self) :
+        for files in self.files.values() :
+            for file in files :
+                file.close()
+        with open(os.path.join(self.folder, 'store.json'), 'w') as file :
+            json.dump({'columns' : self.columns, 'size' : self.size, 'stride' : self.stride,
+                       'fields' : self.fields, 'partitions' : {str(mode) : count for mode, count in sorted(self.counts.items())},
+                       'events' : self.events, 'event_mean' : [float(value) for value in self.scale[0]],
+                       'event_std' : [float(value) for value in self.scale[1]],
+                       'count' : self.count, 'dtype' : self.dtype, 'source' : self.source}, file, indent = 1)
+
+def current(folder, columns, size, stride = None, source = '', dtype = 'float32') :
+    # True if the folder holds a complete store of these columns, window
+    # shape and type, cut from the recordings of the given hash
+    try :
+        with open(os.path.join(folder, 'store.json'), 'r') as file :
+            description = json.load(file)
+    except FileNotFoundError :
+        return False
+    return (description['columns'] == list(columns) and description['size'] == size and
+            description['stride'] == (stride or size) and description.get('source') == source and
+            description.get('dtype', 'float32') == dtype)
+
+def partition_events(folder, size, windows) :
+    # Event lists of the given windows (indices in their partition) :
+    # indptr ([len(windows)*size + 1], events of window row i are indptr[i]
+    # to indptr[i + 1]), event columns and counts
+    per_row = np.fromfile(os.path.join(folder, 'events.u8'), dtype = np.uint8).astype(int)
+    starts = np.concatenate(([0], np.cumsum(per_row)))
+    if starts[-1] :
+        columns = np.memmap(os.path.join(folder, 'event_columns.u8'), dtype = np.uint8, mode = 'r')
+        counts = np.memmap(os.path.join(folder, 'event_counts.i8'), dtype = np.int8, mode = 'r')
+    else :
+        columns, counts = np.zeros(0, dtype = np.uint8), np.zeros(0, dtype = np.int8)
+    rows = (np.asarray(windows, dtype = int)[:,None]*size + np.arange(size)).ravel()
+    lengths = per_row[rows]
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    events = np.repeat(starts[rows] - indptr[:-1], lengths) + np.arange(indptr[-1])
+    return indptr, np.asarray(columns[events]), np.asarray(counts[events])
+
+def densify(indptr, columns, counts, windows, size, mean, std) :
+    # [windows, size, event columns] float32 array of event lists, normalized
+    dense = np.zeros((windows*size, len(mean)))
+    dense[np.repeat(np.arange(windows*size), np.diff(indptr)), columns] = counts
+    return ((dense - mean)/std).astype(np.float32).reshape(windows, size, len(mean))
+
+def load(folder, mode = None, sessions = None, ids = None) :
+    # Memory maps a store. Returns the [windows, rows, columns] array, the
+    # index as a dict of arrays (session, start_time, robot_mode and the
+    # extra fields of the store) and the column names. Only the partition of
+    # mode (every partition if None) is opened and only the windows of the
+    # sessions first to last (sessions = (first, last), every session if
+    # None) are mapped. ids (window ids, as given by metadata.windows) only
+    # keeps those windows, read in id order. One partition without event
+    # columns stays memory mapped, otherwise the windows are read (and their
+    # events densified) and concatenated in robot_mode order. Window ids
+    # count the windows in that same order. A float16 store gives float16
+    # windows (float32 once events are densified in), the reader upcasts.
+    with open(os.path.join(folder, 'store.json'), 'r') as file :
+        description = json.load(file)
+    events = description.get('events', [])
+    dtype = np.dtype(description.get('dtype', 'float32'))
+    shape = (description['size'], len(description['columns']) - len(events))
+    fields = description.get('fields', [])
+    if ids is not None :
+        ids = np.unique(np.asarray(ids, dtype = int))
+    windows, index = [], []
+    # ids of the windows of each partition : first to first + count
+    end = 0
+    for name, count in description['partitions'].items() :
+        first, end = end, end + count
+        if mode is not None and int(name) != mode :
+            continue
+        table = np.loadtxt(os.path.join(partition(folder, int(name)), 'index.csv'), delimiter = ',',
+                           skiprows = 1, ndmin = 2).reshape(-1, 2 + len(fields))
+        start, stop = 0, count
+        if sessions is not None :
+            start, stop = np.searchsorted(table[:,0], [sessions[0], sessions[1] + 1])
+        if stop <= start :
+            continue
+        mapped = np.memmap(os.path.join(partition(folder, int(name)), windows_file(dtype)), dtype = dtype,
+                           mode = 'r', offset = int(start)*dtype.itemsize*shape[0]*shape[1], shape = (int(stop - start),) + shape)
+        rows = np.arange(start, stop)
+        if ids is not None :
+            rows = ids[(ids >= first + start) & (ids < first + stop)] - first
+            mapped = mapped[rows - start]
+        if events :
+            dense = densify(*partition_events(partition(folder, int(name)), shape[0], rows), len(rows), shape[0],
+                            np.array(description['event_mean']), np.array(description['event_std']))
+            mapped = np.concatenate((mapped, dense), axis = 2)
+        windows.append(mapped)
+        index.append(np.column_stack((table[rows][:,:2], np.full(len(rows), int(name)), table[rows][:,2:])))
+    if not windows :
+        windows, index = np.zeros((0, shape[0], len(description['columns'])), dtype = dtype), np.zeros((0, 3 + len(fields)))
+    elif len(windows) == 1 :
+        windows, index = windows[0], index[0]
+    else :
+        windows, index = np.concatenate(windows), np.concatenate(index)
+    index = dict({'session' : index[:,0].astype(int),
+                  'start_time' : index[:,1],
+                  'robot_mode' : index[:,2].astype(int)},
+                 **{field : index[:,3 + i] for i, field in enumerate(fields)})
+    return windows, index, description['columns']
+
+def load_events(folder, mode = None, sessions = None, ids = None) :
+    # Event lists of the windows load(folder, mode, sessions, ids) returns,
+    # without densifying them : indptr ([windows*rows + 1], the events of
+    # row j of window i are indptr[i*rows + j] to indptr[i*rows + j + 1]),
+    # event column indices, raw counts and the event column names
+    with open(os.path.join(folder, 'store.json'), 'r') as file :
+        description = json.load(file)
+    size = description['size']
+    if ids is not None :
+        ids = np.unique(np.asarray(ids, dtype = int))
+    indptr, columns, counts = [np.zeros(1, dtype = int)], [], []
+    end = 0
+    for name, count in description['partitions'].items() :
+        first, end = end, end + count
+        if (mode is not None and int(name) != mode) or not description.get('events') :
+            continue
+        rows = np.arange(count)
+        if sessions is not None :
+            table = np.loadtxt(os.path.join(partition(folder, int(name)), 'index.csv'), delimiter = ',',
+                               skiprows = 1, ndmin = 2)
+            rows = rows[(table[:,0] >= sessions[0]) & (table[:,0] <= sessions[1])]
+        if ids is not None :
+            rows = np.intersect1d(rows, ids - first)
+        pointers, event_columns, event_counts = partition_events(partition(folder, int(name)), size, rows)
+        indptr.append(pointers[1:] + indptr[-1][-1])
+        columns.append(event_columns)
+        counts.append(event_counts)
+    return (np.concatenate(indptr), np.concatenate(columns or [np.zeros(0, dtype = np.uint8)]),
+            np.concatenate(counts or [np.zeros(0, dtype = np.int8)]), description.get('events', []))
+
+def select(windows, index, columns, names = None, mode = None) :
+    # windows of one robot_mode (all if None) restricted to the named columns
+    # (all if None), still memory mapped when nothing is selected
+    if mode is not None :
+        windows = windows[index['robot_mode'] == mode]
+    if names is not None :
+        windows = windows[:, :, [columns.index(name) for name in names]]
+    return windows
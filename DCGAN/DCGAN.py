@@ -10,6 +10,7 @@ from __future__ import print_function
 #%matplotlib inline
 import argparse
 import os
+import sys
 import csv
 import random
 import torch
@@ -31,6 +32,9 @@ from IPython.display import HTML
 import time
 import math
 import tkinter
+sys.path.append('../Cleaning functions')
+import metadata
+import dataset
 
 #%% Initializing parameters
 # Set random seem for reproducibility
@@ -40,10 +44,18 @@ print("Random Seed: ", manualSeed)
 random.seed(manualSeed)
 torch.manual_seed(manualSeed)
 
-# Root directory for dataset
-dataroot = "../Data/All data/autonomou_cleaned_normalized"
+# Root directory for dataset (packed window store written by DataCleaning_STD)
+dataroot = "../Data/windows_normalized_trajectory"
+# Robot mode of the windows to train on (1 autonomous, 0 human, None for both)
+robot_mode = 1
+# Windows to train on, selected on their metadata (metadata.windows in
+# Cleaning functions), e.g. "battery_min < 20 AND alarms > 0", None for all
+window_filter = None
 # Number of workers for dataloader
 workers = 0
+# Batches taken as slices of the dataset tensor (TensorBatches) instead of
+# going through a torch DataLoader
+tensor_batches = True
 # Batch size during training
 batch_size = 64 # 128
 # Number of channels in the training data.
@@ -68,15 +80,14 @@ Create the appropriate dataset class format for our problem
 
 """
 #%% Dataset creation
-def get_data(dataroot):
-    df = pd.read_csv(dataroot, usecols = ['robot_x','robot_y', 'robot_theta'])
-    df = df.values
-    df = torch.DoubleTensor([df])
-    return df
-
-data_sets = dset.DatasetFolder(dataroot, 
-                                   loader=get_data, extensions=['.csv'])
-dataloader = torch.utils.data.DataLoader(data_sets, batch_size, shuffle = False, num_workers = workers)
+# only the partition of robot_mode is read (both partitions if None), once,
+# into a float32 tensor of [1, 10, 3] samples
+window_ids = None if window_filter is None else metadata.windows(dataroot, window_filter)
+data_sets = dataset.TrajectoryDataset(dataroot, robot_mode, ids = window_ids)
+if tensor_batches :
+    dataloader = dataset.TensorBatches(data_sets, batch_size, shuffle = False)
+else :
+    dataloader = torch.utils.data.DataLoader(data_sets, batch_size, shuffle = False, num_workers = workers)
 
 # Decide which device we want to run on
 device = torch.device("cuda:0" if (torch.cuda.is_available() and ngpu > 0) else "cpu")
@@ -96,12 +107,9 @@ def weights_init(m):
     classname = m.__class__.__name__
     if classname.find('Conv') != -1:
         nn.init.normal_(m.weight.data, 0.0, 0.02)
-        m.weight.data = m.weight.data.float()
     elif classname.find('BatchNorm') != -1:
         nn.init.normal_(m.weight.data, 1.0, 0.02)
         nn.init.constant_(m.bias.data, 0)
-        m.weight.data = m.weight.data.float()
-        m.bias.data = m.bias.data.float()
         
 
 #%% Create the generator
@@ -181,6 +189,8 @@ fixed_noise = torch.randn(1, nz, 1, 1, device=device)
 # Establish convention for real and fake labels during training
 real_label = 1
 fake_label = 0
+# float32 targets of the discriminator, the first b_size of them used per batch
+labels = torch.empty(batch_size, device=device)
 
 # Setup Adam optimizers for both G and D
 optimizerD = optim.Adam(netD.parameters(), lr=10*lr, betas=(beta1, 0.999))
@@ -203,8 +213,6 @@ for epoch in range(num_epochs):
     # For each batch in the dataloader
     print('Epoch : ', epoch)
     for i, data in enumerate(dataloader, 0):
-        data[0] = data[0].float()
-        
         ############################
         # (1) Update D network: maximize log(D(x)) + log(1 - D(G(z)))
         ###########################
@@ -213,7 +221,7 @@ for epoch in range(num_epochs):
         # Format batch
         real_cpu = data[0].to(device)
         b_size = real_cpu.size(0)
-        label = torch.full((b_size,), real_label, device=device)
+        label = labels[:b_size].fill_(real_label)
         # Forward pass real batch through D
         output = netD(real_cpu).view(-1)
         # Calculate loss on all-real batch
@@ -292,9 +300,9 @@ plt.plot(D_losses,label="D")
 plt.xlabel("iterations")
 plt.ylabel("Loss")
 plt.legend()
-if dataroot == "../All data/Human data/":
+if robot_mode == 0:
     plt.savefig('../Validation/losses_human.png')
-elif  dataroot == "../All data/Autonomous data/":
+elif robot_mode == 1:
     plt.savefig('../Validation/losses_autonomous.png')
 else :
     plt.savefig('../Validation/losses_all_data.png')
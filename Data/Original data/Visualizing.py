@@ -6,6 +6,7 @@ Created on Fri Jul 12 09:48:11 2019
 """
 
 import os
+import sys
 import math
 import csv
 import torch
@@ -16,6 +17,8 @@ import matplotlib
 import matplotlib.pyplot as plt
 from pylab import *
 import random
+sys.path.append('../../Cleaning functions')
+import window_cache
 
 ######################################
 ###       Data analysis
@@ -29,30 +32,20 @@ random.seed(99)
 
 
 ### Open files
-count = 0
-data = []
-for i in range(15130):
-        try :
-            with open('Autonomous data/'+ str(i) + '.csv', 'r') as file:
-                ###  We will need only
-                ### robot_x, robot_y, theta
-                 data.append(pd.read_csv(file, usecols = ['robot_x','robot_y', 'robot_theta']))
-                 #data.append(list(csv.reader(file, delimiter=',')))
-        
-        except FileNotFoundError :
-            count += 1
-            
-### Files not found or non existant          
-print('Files not found:', count)
+### parsed once, then read from the binary cache of the folder
+###  We will need only
+### robot_x, robot_y, theta
+data, files = window_cache.load('Autonomous data', ['robot_x','robot_y', 'robot_theta'])
+
+### Windows found
+print('Windows read:', len(data))
 
 ### Take a look at the categories
 ### and first 3 lines
-print(data[0].head(3))
+print(data[0][:3])
 
 ### Make sure the values are in the correct format
-print(data[0]['robot_x'].dtypes)
-print(data[0]['robot_y'].dtypes)
-print(data[0]['robot_theta'].dtypes)
+print(data.dtype)
 
 ### Let's plot some trajectories (n)
 ### to grasp what we are looking at
@@ -61,9 +54,9 @@ x = random.sample(range(0,len(data)),n)
 for i in range(10):
     fig=plt.figure()
     ax = fig.add_subplot(111)
-    plt.plot(data[x[i]]['robot_x'],data[x[i]]['robot_y'], 'r*-')
+    plt.plot(data[x[i]][:,0],data[x[i]][:,1], 'r*-')
     j=1
-    for xs,ys in zip(data[x[i]]['robot_x'], data[x[i]]['robot_y']):
+    for xs,ys in zip(data[x[i]][:,0], data[x[i]][:,1]):
         j += 1
         plt.text(xs, ys, '%d' % (j))
     xlabel('x')
@@ -78,30 +71,20 @@ for i in range(10):
 
 
 ### Open files
-count = 0
-data = []
-for i in range(15130):
-        try :
-            with open('Human data/'+ str(i) + '.csv', 'r') as file:
-                ###  We will need only
-                ### robot_x, robot_y, theta
-                 data.append(pd.read_csv(file, usecols = ['robot_x','robot_y', 'robot_theta']))
-                 #data.append(list(csv.reader(file, delimiter=',')))
-        
-        except FileNotFoundError :
-            count += 1
-            
-### Files not found or non existant          
-print('Files not found:', count)
+### parsed once, then read from the binary cache of the folder
+###  We will need only
+### robot_x, robot_y, theta
+data, files = window_cache.load('Human data', ['robot_x','robot_y', 'robot_theta'])
+
+### Windows found
+print('Windows read:', len(data))
 
 ### Take a look at the categories
 ### and first 3 lines
-print(data[0].head(3))
+print(data[0][:3])
 
 ### Make sure the values are in the correct format
-print(data[0]['robot_x'].dtypes)
-print(data[0]['robot_y'].dtypes)
-print(data[0]['robot_theta'].dtypes)
+print(data.dtype)
 
 ### Let's plot some trajectories (n)
 ### to grasp what we are looking at
@@ -110,9 +93,9 @@ x = random.sample(range(0,len(data)),n)
 for i in range(10):
     fig=plt.figure()
     ax = fig.add_subplot(111)
-    plt.plot(data[x[i]]['robot_x'],data[x[i]]['robot_y'], 'r*-')
+    plt.plot(data[x[i]][:,0],data[x[i]][:,1], 'r*-')
     j=1
-    for xs,ys in zip(data[x[i]]['robot_x'], data[x[i]]['robot_y']):
+    for xs,ys in zip(data[x[i]][:,0], data[x[i]][:,1]):
         j += 1
         plt.text(xs, ys, '%d' % (j))
     xlabel('x')
@@ -28,6 +28,9 @@ import matplotlib.animation as animation
 from IPython.display import HTML
 import time
 import math
+import sys
+sys.path.append('../Cleaning functions')
+import normalization
 import tkinter
 
 #%% Initializing parameters
@@ -316,33 +319,9 @@ fake2 = np.array(fake.detach())
 
 sf = 7                                                            ### Définition des fonctions ###
 
-mean = [ 3.87047857e+02,  4.86219043e-01, -8.95424774e-01,  2.83569667e+00,
-        1.18524379e+00, -8.96262946e-02,  4.81105819e-01,  4.93504824e-01,
-        6.19885973e-01,  4.91782204e-01,  4.81375782e-01,  5.83476349e-01,
-        6.03074362e-01,  5.20195787e-01,  6.73261472e-01,  5.90625510e+01,
-        2.71148088e+01,  3.22042461e+01,  2.84388398e+01,  2.69406789e-01,
-        2.74764265e-01,  2.71264390e-01,  2.68690102e-01,  2.71952152e-01,
-        2.84267597e-01,  2.84354371e-01,  2.72549927e-01,  2.85855236e-01,
-        8.35345857e-04,  6.34343741e-01,  4.95883068e-01,  3.64838633e-01,
-        6.69944786e-01,  8.46204773e-02,  1.89166779e-02,  1.21017245e-01,
-        1.21451114e-01,  2.33122505e-01,  8.37945198e-02,  7.82570688e-03,
-        8.03782050e-03,  7.61037943e-03,  8.04746203e-03,  8.33992171e-03,
-        7.64251785e-03,  7.99925439e-03,  7.56217179e-03,  7.43040424e-03,
-        1.98422646e-02]
-
-std =[ 1.64473653e+02, 4.99810049e-01, 7.66177769e-01, 7.58661770e+00,
-       1.09672450e+01, 1.76889881e+00, 4.99642882e-01, 4.99957811e-01,
-       4.85414620e-01, 4.99932463e-01, 4.99653018e-01, 4.92982453e-01,
-       4.89260336e-01, 4.99591964e-01, 4.69020748e-01, 2.81293167e+01,
-       2.51941501e+01, 2.70581870e+01, 3.21741079e+01, 4.43651632e-01,
-       4.46395412e-01, 4.44612214e-01, 4.43278390e-01, 4.44965368e-01,
-       4.51064885e-01, 4.51106376e-01, 4.45271226e-01, 4.51820783e-01,
-       8.34338279e-01, 8.65259623e-01, 2.75119243e+00, 2.36601477e+00,
-       2.79843203e+00, 1.05756455e+00, 1.70870291e-01, 4.45785884e-01,
-       4.51866149e-01, 9.66967280e-01, 4.60258569e-01, 9.32204478e-02,
-       9.34778503e-02, 9.27024626e-02, 9.36659259e-02, 9.46134349e-02,
-       9.10910690e-02, 9.51846167e-02, 9.11154121e-02, 8.95071739e-02,
-       1.39803306e-01]
+## mean and standard deviation the data was standardized with
+## (saved by DataCleaning_STD), indexed as the 49 cleaned features
+mean, std = normalization.load().select()
     
 def clavier(event):    
     '''
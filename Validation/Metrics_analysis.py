@@ -6,6 +6,7 @@ Created on Fri Jul 12 09:48:11 2019
 """
 
 import os
+import sys
 import math
 import csv
 import torch
@@ -18,6 +19,8 @@ from pylab import *
 import random
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import PolynomialFeatures
+sys.path.append('../Cleaning functions')
+import window_cache
 
 ######################################
 ###       Data analysis
@@ -26,31 +29,22 @@ from sklearn.preprocessing import PolynomialFeatures
 
 ### Open files
 ### Autonomous movements
-count = 0
-data = []
-for i in range(15130):
-        try :
-            ##with open('../Data/Human data/original data/'+ str(i) + '.csv', 'r') as file:
-            with open('../Data/Autonomous data/original data/'+ str(i) + '.csv', 'r') as file:
-                ###  We will need only
-                ### robot_x, robot_y, theta
-                 data.append(pd.read_csv(file, usecols = ['robot_x','robot_y', 'robot_theta']))
-                 #data.append(list(csv.reader(file, delimiter=',')))
-        
-        except FileNotFoundError :
-            count += 1
-            
-### Files not found or non existant          
-print('Files not found:', count)
+### parsed once, then read from the binary cache of the folder
+##folder = '../Data/Human data/original data'
+folder = '../Data/Autonomous data/original data'
+###  We will need only
+### robot_x, robot_y, theta
+data, files = window_cache.load(folder, ['robot_x','robot_y', 'robot_theta'])
+
+### Windows found
+print('Windows read:', len(data))
 
 ### Take a look at the categories
 ### and first 3 lines
-print(data[0].head(3))
+print(data[0][:3])
 
 ### Make sure the values are in the correct format
-print(data[0]['robot_x'].dtypes)
-print(data[0]['robot_y'].dtypes)
-print(data[0]['robot_theta'].dtypes)
+print(data.dtype)
 
 ### Let's plot some trajectories
 ### to grasp what we are looking at
@@ -58,9 +52,9 @@ for i in range(20):
     x = random.randint(0, len(data))
     fig=plt.figure()
     ax = fig.add_subplot(111)
-    plt.plot(data[x]['robot_x'],data[x]['robot_y'], 'r*-')
+    plt.plot(data[x][:,0],data[x][:,1], 'r*-')
     j=1
-    for xs,ys in zip(data[x]['robot_x'], data[x]['robot_y']):
+    for xs,ys in zip(data[x][:,0], data[x][:,1]):
         j += 1
         plt.text(xs, ys, '%d' % (j))
     xlabel('x')
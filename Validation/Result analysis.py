@@ -15,32 +15,22 @@ import matplotlib
 import matplotlib.pyplot as plt
 from pylab import *
 import random
+import sys
+sys.path.append('../Cleaning functions')
+import normalization
 
 #%%
 ## DESTANDARDIZATION OF THE DATA:
 ## we must have the results from the dcgan 
 ## accordingly to the original distribution
 
-### Take the mean and standard deviation from original data
-with open('../Data/all_recorded_data.csv', 'r') as file:
-    reader = csv.reader(file, delimiter=',')
-    data = list(reader)
-
-header = np.array(data[0][:49])
-data = np.array(data)
-
-data = data[1:,:49]
-data = data.astype(float)
-
-## mean and standard deviation
-## used to standardized the data
-mean = np.mean(data,axis=0)
-std = np.std(data,axis=0)
+### Take the mean and standard deviation the data was
+### standardized with (saved by DataCleaning_STD)
+normalizer = normalization.load()
 
 ## We only need
 ## robot_x robot_y theta
-mean = mean[3:6]
-std = std[3:6]
+names = ['robot_x', 'robot_y', 'robot_theta']
 
 ### Create new files
 ### following the original distribution
@@ -50,7 +40,7 @@ for i in range(50):
             reader = csv.reader(file, delimiter=',')
             data = np.array(list(reader))
             data = data.astype(float)
-            data = data*std + mean
+            data = normalizer.denormalize(data, names)
         with open('Trajectories/'+ str(i) + '.csv','w',newline='') as newfile :
             writer = csv.writer(newfile,delimiter=',')    
             writer.writerow(['robot_x','robot_y','robot_theta'])
@@ -94,7 +84,7 @@ fake = netG(noise)
 for i in range(len(fake)):
     data1=np.array(fake[i].detach().numpy())
     data1 = data1.astype(float)
-    data1=data1*std+mean
+    data1 = normalizer.denormalize(data1, names)
     fig=plt.figure()
     ## write files for further analysis
     with open('New results/DCGAN_' + str(i) + '.csv', 'w', newline = '') as alldata :